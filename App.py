@@ -7,6 +7,7 @@ import numpy as np
 
 # Modules
 from Modules.Annotate import Annotator
+from Modules.Frame_source import open_source
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("green")
@@ -43,26 +44,11 @@ class SharpeyeApp(ctk.CTk):
 
         self.annotator = Annotator()
 
-        # GStreamer pipeline
+        # GStreamer camera pipeline, see Modules/Frame_source.py
         self.DEVICE_PATH = '/dev/video0'
-        self.pipeline = (
-            f"v4l2src device={self.DEVICE_PATH} ! "
-            "image/jpeg,width=1920,height=1080,framerate=30/1 ! "
-            "jpegdec ! video/x-raw ! "  # CPU-based JPEG decoding
-            "nvvidconv ! video/x-raw,format=BGRx ! "  # GPU-based format conversion
-            "videoconvert ! video/x-raw,format=BGR ! "
-            "appsink"
-        )
-
-        self.cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
+        self.cap = open_source(self.DEVICE_PATH)
         if not self.cap.isOpened():
-            error_msg = (f"Error: Could not open device {self.DEVICE_PATH}. "
-                         "Device may be busy or pipeline is incorrect.\n"
-                         "Test: gst-launch-1.0 v4l2src device=/dev/video0 ! "
-                         "image/jpeg,width=1920,height=1080,framerate=30/1 ! "
-                         "jpegdec ! nvvidconv ! video/x-raw,format=BGRx ! "
-                         "videoconvert ! autovideosink\n"
-                         "Check: lsof /dev/video0 and kill any processes using it.")
+            error_msg = self.cap.error_help()
             self.video_label.configure(text=error_msg, font=("Arial", 12))
             print(error_msg)
             return
@@ -1,29 +1,36 @@
+import time
+IMPORT_START = time.perf_counter()  # startup timing starts before the heavy imports
+
 from typing import Tuple
-import cv2.cuda as cuda
 import cv2
-import time
+import threading
+import queue
 import customtkinter as ctk
-import tkinter as tk
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import numpy as np
 from datetime import datetime
-import json
 import os
-from tkinter import messagebox
-
-# Modules
-from Modules.Annotate import Annotator
-from Modules.Load_annotations import AnnotationLoader
-from Modules.Capture_UI import CameraApp
-from Modules.watching_image import ImageWatcher
+import argparse
+from tkinter import messagebox, simpledialog
+
+# Modules, the annotator, DSLR capture and photo decoding are imported when first used
+from Modules.Frame_grabber import FrameGrabber
+from Modules.Inspection_engine import InspectionEngine
+from Modules.Matching_backends import cuda_available
+from Modules.Frame_renderer import FrameRenderer
+from Modules.Recipe_store import RecipeStore, DEFAULT_MODEL
+from Modules.Stage_timer import StageTimer
+from Modules.Frame_source import open_source, DEVICE_PATH
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("green")
 
 class SharpeyeApp(ctk.CTk):
     # Main def function / Init
-    def __init__(self):
+    def __init__(self, source=DEVICE_PATH, replay_fps=None, replay_loop=False):
         super().__init__()
+        self.startup_timings = {"imports": time.perf_counter() - IMPORT_START}
+        phase_start = time.perf_counter()
 
         self.title("SHARPEYE - VC")
         screen_width = self.winfo_screenwidth()
@@ -39,6 +46,7 @@ class SharpeyeApp(ctk.CTk):
         self.serial_label.pack(side="left", padx=10)
         self.serial_entry = ctk.CTkEntry(self.navbar, width=280, placeholder_text="Enter serial number")
         self.serial_entry.pack(side="left", padx=10)
+        self.serial_entry.bind("<Return>", self.select_recipe)  # scanners send Enter after the serial
 
         self.after(3000, self.serial_entry.focus_set)
 
@@ -66,42 +74,29 @@ class SharpeyeApp(ctk.CTk):
         self.video_canvas = ctk.CTkCanvas(self, highlightthickness=0, bg="#333")
         self.video_canvas.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # for module load annotations
-        self.annotate_loader = AnnotationLoader()
-        self.annotator = Annotator()
-        self.capture = CameraApp()
+        # recipes by board model, shared with the inspection engine
+        self.recipe_store = RecipeStore()
+        self.annotator = None  # created on the first annotation
+        self.capture = None  # DSLR, detected in the background during startup
+        self.capture_id = 0  # latest capture, older downloads are not displayed
+        self.img_label = None
+        self.display_size = (screen_width, screen_height)  # captured photos are fitted to the screen
+        self.use_cuda = False  # probed in the background during startup
 
-        self.use_cuda = cuda.getCudaEnabledDeviceCount() > 0
-        if not self.use_cuda:
-            print("Warning: CUDA not available, falling back to CPU processing")
+        # callables posted by worker threads, run on the Tk thread
+        self.ui_calls = queue.Queue()
 
-        # GStreamer pipeline
-        self.DEVICE_PATH = '/dev/video0'
-        self.pipeline = (
-            f"v4l2src device={self.DEVICE_PATH} ! "
-            "image/jpeg,width=1920,height=1080,framerate=30/1 ! "
-            "jpegdec ! video/x-raw ! "  # CPU-based JPEG decoding
-            "nvvidconv ! video/x-raw,format=BGRx ! "  # GPU-based format conversion
-            "videoconvert ! video/x-raw,format=BGR ! "
-            "appsink"
-        )
+        # frame source: a /dev/video* camera through GStreamer, or a recorded session to replay
+        self.source = source
+        self.replay_fps = replay_fps
+        self.replay_loop = replay_loop
 
-        self.cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
-        if not self.cap.isOpened():
-            error_msg = (f"Error: Could not open device {self.DEVICE_PATH}. "
-                         "Device may be busy or pipeline is incorrect.\n"
-                         "Test: gst-launch-1.0 v4l2src device=/dev/video0 ! "
-                         "image/jpeg,width=1920,height=1080,framerate=30/1 ! "
-                         "jpegdec ! nvvidconv ! video/x-raw,format=BGRx ! "
-                         "videoconvert ! autovideosink\n"
-                         "Check: lsof /dev/video0 and kill any processes using it.")
-            self.video_label.configure(text=error_msg, font=("Arial", 12))
-            print(error_msg)
-            return
-        print("Press q to QUIT.")
+        # camera is opened by the startup thread, the live view starts once it delivers frames
+        self.cap = None
+        self.grabber = None
 
         # ***************************************************** #
-        self.running = True
+        self.running = False
         self.screen_width = screen_width
         self.screen_height = screen_height - 80
         self.current_frame = None
@@ -110,57 +105,194 @@ class SharpeyeApp(ctk.CTk):
         self.start_point = None
         self.end_point = None
         self.drawing = False
+        self.rubber_band = None
+        self.rubber_band_origin = None
         self.screen_width = 1280
         self.screen_height = 720
-        self.annotations = []
-        self.update_video()
-        self.roi_cache = {}
-        self.roi_gpu_cache = {}
-        self.matcher_cache = {}
-        self.initialize()
+        # rolling latency of every live loop stage, F4 shows them on the video
+        self.stage_timer = StageTimer()
+        self.show_stage_overlay = False
+        self.renderer = FrameRenderer(self.video_canvas, self.screen_width, self.screen_height, self.stage_timer)
+        self.annotations = []  # rectangles drawn in the current annotation session
+        self.last_frame_seq = 0
+        self.poll_interval = 5  # ms between checks for a new frame
+        self.golden_frame = None
+
+        # ROI matching runs on the engine's worker, the UI draws the newest finished result.
+        # match modes: see Modules/Inspection_engine.py, the backend is created during startup
+        self.engine = InspectionEngine(backend="auto", match_mode="tracked", threshold=0.7,
+                                       use_motion_gate=True, recipe_store=self.recipe_store,
+                                       timer=self.stage_timer)
+        self.engine.pipeline.start()
+
+        # show the window now, everything slow happens on the startup thread
+        self.poll_ui_calls()
+        self.update_idletasks()
+        self.startup_timings["window"] = time.perf_counter() - phase_start
+        threading.Thread(target=self.staged_startup, daemon=True).start()
 
         # **************************************************** #
 
 
+    def run_in_ui(self, func, *args):
+        """Run func on the Tk thread, safe to call from any thread."""
+        self.ui_calls.put((func, args))
+
+    def poll_ui_calls(self):
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        self.after(50, self.poll_ui_calls)
+
+    def set_status(self, text):
+        """Show text in the status bar, safe to call from any thread."""
+        if threading.current_thread() is threading.main_thread():
+            self.status_label.configure(text=text)
+        else:
+            self.run_in_ui(lambda: self.status_label.configure(text=text))
+
+    def staged_startup(self):
+        """Bring the app up in stages once the window shows: live view first, then the slow parts."""
+        phases = [
+            ("camera", "Opening camera...", self.open_live_view),
+            ("cuda", "Probing CUDA...", self.probe_cuda),
+            ("backend", "Creating matcher...", self.engine.open),
+            ("recipe", "Loading recipe and uploading templates...", self.load_recipe),
+            ("dslr", "Detecting DSLR...", self.initialize_camera),
+        ]
+        for name, message, phase in phases:
+            self.set_status(message)
+            phase_start = time.perf_counter()
+            try:
+                phase()
+            except Exception as e:
+                print(f"Startup phase {name} failed: {e}")
+            self.startup_timings[name] = time.perf_counter() - phase_start
+
+        report = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.startup_timings.items())
+        total = time.perf_counter() - IMPORT_START
+        print(f"Startup timing: {report} (total {total:.2f}s)")
+        if self.engine.recipe_version is not None:
+            self.set_status(f"Ready in {total:.1f}s - recipe {self.engine.board_model} "
+                            f"v{self.engine.recipe_version}: {len(self.engine.annotations)} ROIs")
+        else:
+            self.set_status(f"Ready in {total:.1f}s")
+
+    def open_live_view(self):
+        """Open the camera and start grabbing, the live view starts on the Tk thread."""
+        error_msg = self.open_camera()
+        if error_msg:
+            self.set_status(error_msg)
+            return
+        print("Press q to QUIT.")
+        self.running = True
+        self.run_in_ui(self.update_video)
+
+    def open_camera(self):
+        """Open the frame source and start the frame grabber, returns an error message or None."""
+        self.cap = open_source(self.source, self.replay_fps, self.replay_loop)
+        if not self.cap.isOpened():
+            error_msg = self.cap.error_help()
+            print(error_msg)
+            return error_msg
+        print(f"Reading frames from {self.cap.describe()}")
+
+        # read frames on a background thread, UI only picks up the latest one
+        self.grabber = FrameGrabber(self.cap, timer=self.stage_timer)
+        self.grabber.start()
+        self.last_frame_seq = 0
+        return None
+
+    def probe_cuda(self):
+        self.use_cuda = cuda_available()
+        if not self.use_cuda:
+            print("Warning: CUDA not available, falling back to CPU processing")
+
+
     # initialize the camera for capturing
     def initialize_camera(self):
+        from Modules.Capture_UI import CameraApp  # gphoto2 wrapper, only needed once the DSLR is used
+        if self.capture is None:
+            self.capture = CameraApp()
         self.capture.initialize_camera()
 
 
     # camera capture function
     def capture_function(self):
+        if self.capture is None:
+            self.set_status("DSLR is still being detected, try again in a moment")
+            return
+        future = self.capture.capture_photo()
+        if future is None:
+            self.set_status("DSLR is not ready, check the camera connection")
+            return
         self.stop_live_view()
-        self.capture.capture_photo()
-        time.sleep(0.5)
         self.back_btn.pack(side="left", padx=5)
-        self.display_image()
 
-
-    # display the image from watcher
-    def display_image(self):
-        # display the image captured
-        self.img_label = ctk.CTkLabel(self, text="", fg_color="#fff")
+        # display the photo the moment its download finishes, in a fresh label for every capture
+        if self.img_label is not None and self.img_label.winfo_exists():
+            self.img_label.destroy()
+        self.img_label = ctk.CTkLabel(self, text="Capturing...", fg_color="#fff")
         self.img_label.pack(padx=10, pady=10)
+        self.capture_id += 1
+        capture_id = self.capture_id
+        future.add_done_callback(
+            lambda done: threading.Thread(target=self.prepare_capture, args=(done, capture_id), daemon=True).start())
+
 
-        # Start watching folder
-        folder_path = "/home/nvidia/Main_Folder/Inspected_images/Captured_Images"
-        self.watcher = ImageWatcher(folder_path, self.img_label, update_interval=1)
-        self.watcher.start()
+    def prepare_capture(self, future, capture_id):
+        """Decode the downloaded photo fitted to the screen, off the Tk thread."""
+        from Modules.watching_image import prepare_image
+
+        try:
+            result = future.result()
+            start_time = time.perf_counter()
+            img = prepare_image(result["path"], self.display_size)
+            result["decode_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        except Exception as e:
+            self.run_in_ui(self.show_capture_error, f"Capture failed: {e}", capture_id)
+            return
+        self.run_in_ui(self.display_image, img, result, capture_id)
+
+
+    # replace "Capturing..." with the reason the capture failed
+    def show_capture_error(self, text, capture_id):
+        self.set_status(text)
+        if capture_id != self.capture_id or self.img_label is None or not self.img_label.winfo_exists():
+            return
+        self.img_label.configure(text=text)
+
+
+    # display the captured image
+    def display_image(self, img, result, capture_id):
+        # a photo arriving after Back was pressed, or after a newer capture, is dropped
+        if capture_id != self.capture_id or self.img_label is None or not self.img_label.winfo_exists():
+            return
+        tk_img = ImageTk.PhotoImage(img)
+        self.img_label.image = tk_img  # keep a reference against garbage collection
+        self.img_label.configure(image=tk_img, text="", width=img.width, height=img.height)
+        print(f"Displayed {result['path']}: capture {result['capture_ms']:.0f} ms, "
+              f"queued {result['queued_ms']:.0f} ms, decode {result['decode_ms']:.0f} ms")
+        self.set_status(f"Captured {os.path.basename(result['path'])} in {result['queued_ms'] / 1000:.1f}s")
 
 
     # stop the video live viewing
     def stop_live_view(self):
-        """Stop webcam live preview and remove canvas"""
+        """Pause the webcam live preview and hide the canvas, the camera pipeline stays open"""
         try:
-            # Release webcam if running
-            if hasattr(self, "cap") and self.cap.isOpened():
-                self.cap.release()
-                print("Live view stopped and webcam released.")
+            switch_start = time.perf_counter()
+            # Stop the video loop, the grabber stops reading but keeps the webcam
+            self.running = False
+            if self.grabber:
+                self.grabber.pause()
 
-            # Remove the video canvas if it exists
-            if hasattr(self, "video_canvas") and self.video_canvas.winfo_exists():
-                self.video_canvas.destroy()
-                print("Live view canvas removed.")
+            # Hide the video canvas, it is shown again by start_live_view
+            if self.video_canvas.winfo_exists():
+                self.video_canvas.pack_forget()
+            print(f"Live view paused in {(time.perf_counter() - switch_start) * 1000:.1f} ms.")
 
         except Exception as e:
             print(f"Error stopping live view: {e}")
@@ -168,39 +300,31 @@ class SharpeyeApp(ctk.CTk):
 
     # Start the live viewing again for back button
     def start_live_view(self):
-        """Start webcam live preview and remove photo label"""
+        """Resume the webcam live preview and remove photo label"""
         try:
-            # stop the watcher if running
-            if hasattr(self, "watcher") and self.watcher:
-                self.watcher.stop()
-                self.watcher = None
-                print("Image watcher stopped.")
+            switch_start = time.perf_counter()
+            # a capture still downloading is not displayed anymore
+            self.capture_id += 1
 
             # destroy the label if it exists
-            if hasattr(self, "img_label") and self.img_label and self.img_label.winfo_exists():
+            if self.img_label is not None and self.img_label.winfo_exists():
                 self.img_label.destroy()
                 self.img_label = None
                 print("Image label destroyed.")
 
-            # recreate the canvas if needed
-            if not hasattr(self, "video_canvas") or not self.video_canvas.winfo_exists():
-                self.video_canvas = ctk.CTkCanvas(self, highlightthickness=0, bg="#333")
-
             self.video_canvas.pack(fill="both", expand=True, padx=10, pady=10)
 
-            # reinitialize camera
-            self.cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
-            if not self.cap.isOpened():
-                error_msg = (
-                    f"Error: Could not open device {self.DEVICE_PATH}. "
-                    "Device may be busy or pipeline is incorrect.\n"
-                    f"Test pipeline: gst-launch-1.0 {self.pipeline.replace('appsink', 'autovideosink')}\n"
-                    "Check: lsof /dev/video0 and kill any processes using it.\n"
-                    "Verify formats: v4l2-ctl --list-formats-ext -d /dev/video0"
-                )
-                self.status_label.configure(text=error_msg)
-                print(error_msg)
-                return
+            # resume the open camera, it is only reopened when it failed or never opened
+            if self.grabber is not None and not self.grabber.failed:
+                self.grabber.resume()
+            else:
+                if self.cap is not None:
+                    self.cap.release()
+                error_msg = self.open_camera()
+                if error_msg:
+                    self.status_label.configure(text=error_msg)
+                    return
+            self.engine.reset()
 
             # set running to True again
             self.running = True
@@ -208,162 +332,91 @@ class SharpeyeApp(ctk.CTk):
 
             # restart video update loop
             self.resume_video()
-            print("Live view restarted.")
+            print(f"Live view resumed in {(time.perf_counter() - switch_start) * 1000:.1f} ms.")
 
         except Exception as e:
             print(f"Error starting live view: {e}")
 
 
     # initialize function from modules
-    def initialize(self):
-        """Initialize by loading annotations."""
-        self.annotate_loader.load_annotations()
-        self.annotations = self.annotate_loader.annotations
-        print(f"Loaded {len(self.annotations)} annotations for display")
-
-        # Cache ROI images on GPU
-        for rect in self.annotations:
-            roi_file = rect.get("roi_file")
-            if not roi_file:
-                continue
-
-            roi_img = cv2.imread(roi_file, cv2.IMREAD_GRAYSCALE)
-            if roi_img is None:
-                print(f"Warning: Could not load ROI {roi_file}")
-                continue
-
-            self.roi_cache[roi_file] = roi_img
-
-            if self.use_cuda:
-                roi_gpu = cuda.GpuMat()
-                roi_gpu.upload(roi_img)
-                self.roi_gpu_cache[roi_file] = roi_gpu
-
-        print(f"Preloaded {len(self.roi_cache)} ROI images into cache.")
-
-    
-    def matched_roi_frame(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        matches = []
-
-        try:
-            if self.use_cuda:
-                gpu_frame = cuda.GpuMat()
-                gpu_frame.upload(gray)
-            else:
-                gpu_frame = None
-        except cv2.error as e:
-            print(f"GPU upload failed: {e}")
-            return matches
-
-        for rect in self.annotations:
-            roi_file = rect.get("roi_file")
-            if not roi_file or roi_file not in self.roi_cache:
-                continue
-
-            roi_img = self.roi_cache[roi_file]
-
-            # Skip if ROI is bigger than frame
-            if roi_img.shape[0] > gray.shape[0] or roi_img.shape[1] > gray.shape[1]:
-                continue
-
-            try:
-                if self.use_cuda:
-                    # Ensure ROI is cached on GPU
-                    if roi_file not in self.roi_gpu_cache:
-                        gpu_roi = cuda.GpuMat()
-                        gpu_roi.upload(roi_img)
-                        self.roi_gpu_cache[roi_file] = gpu_roi
-                    else:
-                        gpu_roi = self.roi_gpu_cache[roi_file]
+    def select_recipe(self, event=None):
+        """Load the recipe of the board model the scanned serial number belongs to."""
+        self.initialize()
 
-                    # Ensure matcher is cached
-                    if roi_file not in self.matcher_cache:
-                        self.matcher_cache[roi_file] = cuda.createTemplateMatching(
-                            cv2.CV_8U, cv2.TM_CCOEFF_NORMED
-                        )
+    def initialize(self, board_model=None):
+        """Initialize by loading the annotations of one recipe into the inspection engine."""
+        self.load_recipe(board_model, self.serial_entry.get().strip())
+
+    def load_recipe(self, board_model=None, serial=""):
+        """Load the recipe of a board model, or of the model the serial belongs to."""
+        version = self.engine.load_recipe(board_model, serial)
+        print(f"Loaded {len(self.engine.annotations)} annotations for display")
+        if version is not None:
+            self.set_status(f"Recipe {self.engine.board_model} v{version}: {len(self.engine.annotations)} ROIs")
+        elif serial:
+            self.set_status(f"No recipe found for serial {serial}")
+
+
+    # print the live loop counters
+    def show_stats(self, event=None):
+        """Print grabber, inspection and motion gate counters and show them in the status bar."""
+        if self.grabber is None:
+            self.status_label.configure(text="Camera is not open yet")
+            return
+        stats = {**self.grabber.stats(), **self.engine.stats()}
+        print(f"Live stats: {stats}")
+        self.status_label.configure(
+            text=f"Frames dropped: {stats['frames_dropped']} | matched: {stats['frames_matched']} | "
+                 f"skipped (no motion): {stats['gate_frames_skipped']}/{stats['gate_frames_checked']}"
+        )
 
-                    matcher = self.matcher_cache[roi_file]
 
-                    # Run template matching
-                    result = matcher.match(gpu_frame, gpu_roi)
-                    result = result.download()
-                    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    # compare pyramid matching against a full search on the current frame
+    def report_pyramid_deviation(self, event=None):
+        """Print score deviation and timing of pyramid matching versus full search."""
+        if self.current_frame is None:
+            print("No frame available for pyramid report")
+            return
 
-            except cv2.error as e:
-                print(f"Template matching failed for {roi_file}: {e}")
-                continue
+        report = self.engine.pyramid_report(self.current_frame)
+        if not report:
+            print("No ROIs to compare")
+            return
 
-            if max_val >= 0.7:
-                h_roi, w_roi = roi_img.shape[:2]
-                top_left = (max_loc[0], max_loc[1])
-                bottom_right = (top_left[0] + w_roi, top_left[1] + h_roi)
-                matches.append((top_left, bottom_right, roi_file, max_val))
+        for row in report:
+            print(f"{os.path.basename(row['roi_file'])}: full={row['full_score']:.3f} "
+                  f"pyramid={row['pyramid_score']:.3f} delta={row['score_delta']:.3f} "
+                  f"offset={row['loc_offset']}px ({row['full_ms']:.1f}ms -> {row['pyramid_ms']:.1f}ms)")
 
-        return matches
+        max_delta = max(abs(row["score_delta"]) for row in report)
+        full_ms = sum(row["full_ms"] for row in report)
+        pyramid_ms = sum(row["pyramid_ms"] for row in report)
+        summary = (f"Pyramid x{self.engine.pyramid_levels}: max score delta {max_delta:.3f}, "
+                   f"{full_ms:.1f}ms -> {pyramid_ms:.1f}ms for {len(report)} ROIs")
+        print(summary)
+        self.status_label.configure(text=summary)
 
 
     # Display frame to see the results live viewing
-    def display_frame(self, frame):
-        """Display a frame with dynamic ROI template matching results."""
+    def display_frame(self, frame, matches=None):
+        """Display a frame with ROI template matching results, matches are computed here if not given."""
         if frame is None or frame.size == 0:
             return
 
-        display = frame.copy()
-        frame_height, frame_width = display.shape[:2]
-        if frame_height == 0 or frame_width == 0:
-            return
-
-        print(f"Displaying frame with {len(self.annotations)} annotations")
+        print(f"Displaying frame with {len(self.engine.annotations)} annotations")
 
         # Use dynamic matcher to find ROIs anywhere in the frame
-        matches = self.matched_roi_frame(display)
-
-        # Draw matches
-        if matches:
-            for top_left, bottom_right, roi_file, score in matches:
-                display_name = os.path.splitext(os.path.basename(roi_file))[0]
-                cv2.rectangle(display, top_left, bottom_right, (0, 0, 255), 2)
-                cv2.putText(
-                    display,
-                    f"{display_name} - ({score:.2f})",
-                    (top_left[0], max(0, top_left[1] - 10)),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 255), 1)
-        else:
+        if matches is None:
+            matches = self.engine.match(frame)
+        if not matches:
             print("No detected annotation!")
 
-        # Resize for Tkinter canvas
-        canvas_width = max(self.video_canvas.winfo_width(), 1)
-        canvas_height = max(self.video_canvas.winfo_height(), 1)
-        scale = min(self.screen_width / frame_width, self.screen_height / frame_height)
-        new_width, new_height = int(frame_width * scale), int(frame_height * scale)
-
-        if new_width > 0 and new_height > 0:
-            resized_frame = cv2.resize(display, (new_width, new_height), interpolation=cv2.INTER_AREA)
-            rgb_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb_frame)
-            imgtk = ImageTk.PhotoImage(image=img)
-
-            self.video_canvas.delete("all")
-            self.video_canvas.create_image(
-                canvas_width // 2,
-                canvas_height // 2,
-                image=imgtk,
-                anchor=tk.CENTER
-            )
-            self.video_canvas.imgtk = imgtk
-
-    # start drawing
-    def start_drawing(self, event):
-        if not self.is_annotating:
-            return
-        self.drawing = True
-
-        if self.current_frame is None or self.current_frame.size == 0:
-            print("Error: No valid frame to annotate")
-            self.drawing = False
-            return
+        # Draw into the reused canvas image, the frame itself is left untouched
+        self.renderer.render(frame, matches)
 
+    # map a mouse event on the canvas to frame coordinates
+    def event_to_frame(self, event):
+        """Return the clamped frame point and canvas point of a mouse event on the displayed frame."""
         frame_height, frame_width = self.current_frame.shape[:2]
         canvas_width = max(self.video_canvas.winfo_width(), 1)
         canvas_height = max(self.video_canvas.winfo_height(), 1)
@@ -380,86 +433,66 @@ class SharpeyeApp(ctk.CTk):
 
         scale_x = frame_width / new_width
         scale_y = frame_height / new_height
-        self.start_point = (int(adj_x * scale_x), int(adj_y * scale_y))
+        frame_point = (int(adj_x * scale_x), int(adj_y * scale_y))
 
         # Clamp to frame bounds
-        self.start_point = (
-            max(0, min(self.start_point[0], frame_width - 1)),
-            max(0, min(self.start_point[1], frame_height - 1))
+        frame_point = (
+            max(0, min(frame_point[0], frame_width - 1)),
+            max(0, min(frame_point[1], frame_height - 1))
         )
-        print(f"Mouse clicked at: ({event.x}, {event.y}) → start_point: {self.start_point}")
+        return frame_point, (adj_x + offset_x, adj_y + offset_y)
 
-    def update_drawing(self, event):
-        if not self.is_annotating or not self.drawing:
+    # start drawing
+    def start_drawing(self, event):
+        if not self.is_annotating:
             return
+        self.drawing = True
 
         if self.current_frame is None or self.current_frame.size == 0:
             print("Error: No valid frame to annotate")
+            self.drawing = False
             return
 
-        frame_height, frame_width = self.current_frame.shape[:2]
-        canvas_width = max(self.video_canvas.winfo_width(), 1)
-        canvas_height = max(self.video_canvas.winfo_height(), 1)
+        self.start_point, canvas_point = self.event_to_frame(event)
+        print(f"Mouse clicked at: ({event.x}, {event.y}) → start_point: {self.start_point}")
 
-        scale = min(self.screen_width / frame_width, self.screen_height / frame_height)
-        new_width = int(frame_width * scale)
-        new_height = int(frame_height * scale)
+        # Drag preview is a canvas rectangle moved in place, the frame is not redrawn
+        self.clear_rubber_band()
+        self.rubber_band_origin = canvas_point
+        self.rubber_band = self.video_canvas.create_rectangle(
+            *canvas_point, *canvas_point, outline="red", width=1
+        )
 
-        offset_x = (canvas_width - new_width) // 2
-        offset_y = (canvas_height - new_height) // 2
+    def update_drawing(self, event):
+        if not self.is_annotating or not self.drawing:
+            return
 
-        adj_x = max(0, min(event.x - offset_x, new_width - 1))
-        adj_y = max(0, min(event.y - offset_y, new_height - 1))
+        if self.current_frame is None or self.current_frame.size == 0:
+            print("Error: No valid frame to annotate")
+            return
 
-        scale_x = frame_width / new_width
-        scale_y = frame_height / new_height
-        self.end_point = (int(adj_x * scale_x), int(adj_y * scale_y))
+        self.end_point, canvas_point = self.event_to_frame(event)
 
-        # Clamp to frame bounds
-        self.end_point = (
-            max(0, min(self.end_point[0], frame_width - 1)),
-            max(0, min(self.end_point[1], frame_height - 1))
-        )
-        print(f"Mouse dragging at: ({event.x}, {event.y}) → end_point: {self.end_point}")
+        # Move the preview rectangle
+        if self.rubber_band is not None:
+            self.video_canvas.coords(self.rubber_band, *self.rubber_band_origin, *canvas_point)
 
-        # Draw temporary rectangle
-        temp_frame = self.current_frame.copy()
-        if self.start_point and self.end_point:
-            cv2.rectangle(temp_frame, self.start_point, self.end_point, (0, 0, 255), 1)
-            self.display_frame(temp_frame)
+    def clear_rubber_band(self):
+        if self.rubber_band is not None:
+            self.video_canvas.delete(self.rubber_band)
+            self.rubber_band = None
 
     def stop_drawing(self, event):
         if not self.is_annotating:
             return
         self.drawing = False
+        self.clear_rubber_band()
 
         if self.current_frame is None or self.current_frame.size == 0:
             print("Error: No valid frame to annotate")
             return
 
-        frame_height, frame_width = self.current_frame.shape[:2]
-        canvas_width = max(self.video_canvas.winfo_width(), 1)
-        canvas_height = max(self.video_canvas.winfo_height(), 1)
-
-        scale = min(self.screen_width / frame_width, self.screen_height / frame_height)
-        new_width = int(frame_width * scale)
-        new_height = int(frame_height * scale)
-
-        offset_x = (canvas_width - new_width) // 2
-        offset_y = (canvas_height - new_height) // 2
-
-        adj_x = max(0, min(event.x - offset_x, new_width - 1))
-        adj_y = max(0, min(event.y - offset_y, new_height - 1))
-
-        scale_x = frame_width / new_width
-        scale_y = frame_height / new_height
-        self.end_point = (int(adj_x * scale_x), int(adj_y * scale_y))
-
-        # Clamp to frame bounds
-        self.end_point = (
-            max(0, min(self.end_point[0], frame_width - 1)),
-            max(0, min(self.end_point[1], frame_height - 1))
-        )
+        self.end_point, _ = self.event_to_frame(event)
         print(f"Mouse released at: ({event.x}, {event.y}) → end_point: {self.end_point}")
 
         if self.start_point and self.end_point:
@@ -499,42 +532,45 @@ class SharpeyeApp(ctk.CTk):
             else:
                 print("Warning: Invalid rectangle size (width or height <= 0), not saved")
 
-        # Display the frame with the persisted rectangle
-        self.display_frame(self.current_frame)
+        # Display the frame with the persisted rectangle, no matching while annotating
+        self.display_frame(self.current_frame, matches=[])
 
 
     def annotate_save_btn(self):
-        """Save all accumulated annotations and their ROI file paths to a JSON file."""
+        """Save all accumulated annotations as a new version of the board model's recipe."""
         if not self.annotations:
             print("No annotations to save.")
             return
 
-        # Prepare save structure
-        save_data = {
-            "annotations": self.annotations,  # includes roi_file
-            "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        board_model = simpledialog.askstring(
+            "Board model", "Save recipe for board model:",
+            initialvalue=self.engine.board_model or self.serial_entry.get().strip() or DEFAULT_MODEL, parent=self)
+        if not board_model or not board_model.strip():
+            print("Save cancelled, no board model given.")
+            return
+        board_model = board_model.strip()
 
         # Ensure save directory exists
         save_dir = os.path.abspath("annotation_logs")  # Use absolute path
         os.makedirs(save_dir, exist_ok=True)
 
-        # Save to JSON with timestamp
-        filename = os.path.join(save_dir, f"annotations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(filename, "w") as f:
-            json.dump(save_data, f, indent=4)
-            f.flush()  # Ensure file is written
+        # Save the golden board frame the ROIs were cut from, used for board registration
+        golden_path = None
+        if self.golden_frame is not None:
+            golden_dir = os.path.join(save_dir, "golden_images")
+            os.makedirs(golden_dir, exist_ok=True)
+            golden_path = os.path.join(golden_dir, f"golden_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
+            cv2.imwrite(golden_path, self.golden_frame)
+            for rect in self.annotations:
+                rect["golden_file"] = golden_path
 
-        print(f"Annotations & ROI paths saved to {filename}")
-        messagebox.showinfo("Info", "Saved Successfully!")
+        version = self.recipe_store.save_recipe(board_model, self.annotations, golden_path)
 
-        time.sleep(1)  # Consider removing if not needed
-        self.resume_video()
-        self.annotate_loader.load_annotations()
-        self.annotations = self.annotate_loader.annotations
-        print(f"Loaded new {len(self.annotations)} annotations for display")
+        print(f"Annotations & ROI paths saved as recipe {board_model} v{version}")
+        messagebox.showinfo("Info", f"Saved Successfully! ({board_model} v{version})")
 
-        self.initialize()
+        self.resume_video()
+        self.initialize(board_model)
 
         self.video_canvas.update()
         self.video_canvas.update_idletasks()
@@ -544,6 +580,9 @@ class SharpeyeApp(ctk.CTk):
         try:
             print(f"Annotating frame with shape: {self.current_frame.shape}")
             print(f"Using coordinates: {self.start_point} to {self.end_point}")
+            if self.annotator is None:
+                from Modules.Annotate import Annotator
+                self.annotator = Annotator()
             start_time = time.time()
             annotated_frame, result = self.annotator.annotate_frame(self.current_frame.copy(), self.start_point, self.end_point)
             print(f"Annotation took {time.time() - start_time:.2f} seconds")
@@ -551,7 +590,7 @@ class SharpeyeApp(ctk.CTk):
             self.current_frame = annotated_frame
             self.show_annotated = True
             self.status_label.configure(text=f"Module Result: {result}")
-            self.display_frame(self.current_frame)
+            self.display_frame(self.current_frame, matches=[])
             # Reset coordinates and drawing state
             self.start_point = None
             self.end_point = None
@@ -569,19 +608,23 @@ class SharpeyeApp(ctk.CTk):
         # reset the drawn rectangle
         self.annotations = []
 
-        # Capture a fresh frame and pause live feed
-        ret, frame = self.cap.read()
-        if not ret:
+        # Take the latest grabbed frame and pause live feed
+        _, _, frame = self.grabber.latest() if self.grabber else (0, 0, None)
+        if frame is None:
             error_msg = "Error: Failed to capture frame for annotation"
             self.status_label.configure(text=error_msg)
             print(error_msg)
             return
-        self.current_frame = frame
+
+        # annotate at the live view size so ROI positions match what the matcher sees
+        self.current_frame = self.resize_frame(frame)
+        self.golden_frame = self.current_frame.copy()  # clean copy, rectangles are drawn on current_frame
         self.is_annotating = True  # Pause live feed
         self.show_annotated = False
 
+        # Render the frozen frame once, drawing only moves a canvas rectangle
         print(f"Captured frame for annotation: {frame.shape}")
-        self.display_frame(self.current_frame)
+        self.display_frame(self.current_frame, matches=[])
         self.status_label.configure(text="Click and drag to draw a rectangle")
 
         # Bind mouse events for drawing
@@ -596,6 +639,7 @@ class SharpeyeApp(ctk.CTk):
         self.start_point = None
         self.end_point = None
         self.drawing = False
+        self.clear_rubber_band()
 
         # reset the drawn rectangle
         self.annotations = []
@@ -604,47 +648,106 @@ class SharpeyeApp(ctk.CTk):
         self.update_video()
 
 
+    def resize_frame(self, frame):
+        """Resize a camera frame to the live view size, ROIs are annotated and matched at this size."""
+        scale = min(self.screen_width / frame.shape[1], self.screen_height / frame.shape[0])
+        new_width = int(frame.shape[1] * scale)
+        new_height = int(frame.shape[0] * scale)
+
+        if not self.use_cuda:
+            return cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+        # Upload frame to GPU
+        gpu_frame = cv2.cuda.GpuMat()
+        gpu_frame.upload(frame)
+
+        # Resize on GPU
+        gpu_resized = cv2.cuda.resize(gpu_frame, (new_width, new_height))
+
+        # Download back to CPU (needed for Tkinter display)
+        return gpu_resized.download()
+
+
     def update_video(self):
         if not getattr(self, "running", False) or self.is_annotating:
             return
 
-        ret, frame = self.cap.read()
-        if not ret:
+        if self.grabber.failed:
             print("Error: Failed to capture frame.")
             self.running = False
             if self.cap:
                 self.cap.release()
             return
 
-        # Upload frame to GPU
-        gpu_frame = cuda.GpuMat()
-        gpu_frame.upload(frame)
-
-        # Resize on GPU
-        scale = min(self.screen_width / frame.shape[1], self.screen_height / frame.shape[0])
-        new_width = int(frame.shape[1] * scale)
-        new_height = int(frame.shape[0] * scale)
-        gpu_resized = cuda.resize(gpu_frame, (new_width, new_height))
-
-        # Download back to CPU (needed for Tkinter display)
-        frame = gpu_resized.download()
+        # only render when the grabber has a new frame, never block on the camera
+        seq, _, frame = self.grabber.latest()
+        if frame is None or seq == self.last_frame_seq:
+            self.after(self.poll_interval, self.update_video)
+            return
+        self.last_frame_seq = seq
 
+        with self.stage_timer.stage("resize"):
+            frame = self.resize_frame(frame)
         self.current_frame = frame
-        self.display_frame(frame)
+
+        # hand the frame to the matching worker and draw the newest finished result
+        self.engine.submit(seq, frame)
+        _, _, matches = self.engine.latest_result()
+        self.display_frame(frame, matches)
 
         # keep updating
-        self.after(33, self.update_video)
+        self.after(self.poll_interval, self.update_video)
+
+
+    # on-screen stage latencies
+    def toggle_stage_overlay(self, event=None):
+        """Show or hide the p50/p95/p99 latency of each live loop stage on the video."""
+        self.show_stage_overlay = not self.show_stage_overlay
+        if self.show_stage_overlay:
+            self.update_stage_overlay()
+        elif self.video_canvas.winfo_exists():
+            self.video_canvas.delete("stage_overlay")
+
+    def update_stage_overlay(self):
+        if not self.show_stage_overlay:
+            return
+        if self.video_canvas.winfo_exists():
+            self.video_canvas.delete("stage_overlay")
+            self.video_canvas.create_text(20, 20, text=self.stage_timer.report(), anchor="nw", fill="#0f0",
+                                          font=("Courier", 12), tags="stage_overlay")
+        self.after(500, self.update_stage_overlay)
 
 
     def destroy(self):
         self.running = False
-        if hasattr(self, 'cap') and self.cap.isOpened():
+        if hasattr(self, 'stage_timer'):
+            print(f"Stage timings over the last {self.stage_timer.window} samples:\n{self.stage_timer.report()}")
+        if hasattr(self, 'grabber') and self.grabber:
+            self.grabber.stop()
+            print(f"Frame grabber stats: {self.grabber.stats()}")
+        if hasattr(self, 'engine'):
+            print(f"Inspection stats: {self.engine.stats()}")
+            self.engine.close()
+        if getattr(self, 'cap', None) is not None and self.cap.isOpened():
             self.cap.release()
+        if getattr(self, 'capture', None) is not None:
+            self.capture.close()  # ends the gphoto2 session so the camera is free for the next run
+        if hasattr(self, 'recipe_store'):
+            self.recipe_store.close()
         super().destroy()
 
 if __name__ == "__main__":
-    app = SharpeyeApp()
+    parser = argparse.ArgumentParser(description="SHARPEYE visual inspection")
+    parser.add_argument("--source", default=DEVICE_PATH,
+                        help="Camera device, or a video file / image folder / glob to replay")
+    parser.add_argument("--fps", type=float, default=None, help="Replay rate, default: as fast as possible")
+    parser.add_argument("--loop", action="store_true", help="Start the replay over at the end")
+    args = parser.parse_args()
+
+    app = SharpeyeApp(args.source, args.fps, args.loop)
     app.protocol("WM_DELETE_WINDOW", app.destroy)
-    app.initialize_camera()
     app.bind('<q>', lambda event: app.destroy())
+    app.bind('<F2>', app.report_pyramid_deviation)
+    app.bind('<F3>', app.show_stats)
+    app.bind('<F4>', app.toggle_stage_overlay)
     app.mainloop()
\ No newline at end of file
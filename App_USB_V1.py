@@ -10,6 +10,7 @@ import os
 
 # Modules
 from Modules.Annotate import Annotator
+from Modules.Frame_source import GStreamerSource
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("green")
@@ -51,28 +52,11 @@ class SharpeyeApp(ctk.CTk):
 
         self.annotator = Annotator()
 
-        # GStreamer pipeline for USB webcam
+        # GStreamer pipeline for USB webcam, MJPEG at 1280x720
         self.DEVICE_PATH = '/dev/video0'
-
-        # Pipeline for MJPEG output
-        self.pipeline = (
-            f"v4l2src device={self.DEVICE_PATH} ! "
-            "image/jpeg,width=1280,height=720,framerate=30/1 ! "
-            "jpegdec ! video/x-raw ! "
-            "nvvidconv ! video/x-raw,format=BGRx ! "
-            "videoconvert ! video/x-raw,format=BGR ! "
-            "appsink"
-        )
-
-        self.cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
+        self.cap = GStreamerSource(self.DEVICE_PATH, width=1280, height=720)
         if not self.cap.isOpened():
-            error_msg = (
-                f"Error: Could not open device {self.DEVICE_PATH}. "
-                "Device may be busy or pipeline is incorrect.\n"
-                f"Test pipeline: gst-launch-1.0 {self.pipeline.replace('appsink', 'autovideosink')}\n"
-                "Check: lsof /dev/video0 and kill any processes using it.\n"
-                "Verify formats: v4l2-ctl --list-formats-ext -d /dev/video0"
-            )
+            error_msg = self.cap.error_help()
             self.status_label.configure(text=error_msg)
             print(error_msg)
             return
@@ -0,0 +1,182 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+from PIL import Image
+
+# Modules
+from Modules.Inspection_engine import InspectionEngine, MATCH_MODES
+
+# Batch parameters
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+FRAME_SIZE = (1280, 720)  # Recipes are annotated at the live view size, images are fitted into it
+PREFETCH = 2  # Images queued per worker, bounds the decoded images held in memory
+MATCH_MODE = "anchored"  # Boards are independent images, so no tracking between them
+
+CSV_FIELDS = ["image", "roi_file", "found", "score", "x", "y", "expected_x", "expected_y", "width", "height"]
+
+_engine = None  # one engine per worker process
+
+
+def find_images(inputs):
+    """Expand folders and glob patterns into a sorted list of image files"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            paths = glob.glob(item, recursive=True)
+        files.extend(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+    return sorted(set(files))
+
+
+def decode_fitted(path, frame_size=FRAME_SIZE):
+    """Decode an image fitted into frame_size, JPEGs are decoded at a reduced size when they are much larger"""
+    with Image.open(path) as img:
+        width, height = img.size  # header only
+    scale = min(frame_size[0] / width, frame_size[1] / height, 1.0)
+
+    flags = cv2.IMREAD_COLOR
+    for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                            (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if scale * factor <= 1.0:
+            flags = reduced
+            break
+
+    frame = cv2.imread(path, flags)
+    if frame is None:
+        raise ValueError("unreadable image")
+    size = (int(width * scale), int(height * scale))
+    if (frame.shape[1], frame.shape[0]) != size:
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def _init_worker(board_model, version, match_mode, backend, threshold):
+    global _engine
+    cv2.setNumThreads(1)  # one process per core already
+    _engine = InspectionEngine(backend=backend, match_mode=match_mode, threshold=threshold,
+                               use_motion_gate=False, decode_workers=1)
+    _engine.open()
+    _engine.load_recipe(board_model, version=version)
+
+
+def _inspect_file(path, frame_size):
+    start_time = time.perf_counter()
+    try:
+        frame = decode_fitted(path, frame_size)
+    except (OSError, ValueError) as e:
+        return {"image": path, "error": str(e)}
+    decode_ms = (time.perf_counter() - start_time) * 1000
+
+    result = _engine.inspect(frame)
+    del result["matches"]
+    result["image"] = path
+    result["decode_ms"] = round(decode_ms, 2)
+    return result
+
+
+def run_batch(files, board_model, version=None, jsonl_path=None, csv_path=None, workers=None,
+              prefetch=PREFETCH, match_mode=MATCH_MODE, backend="opencv", threshold=0.7, frame_size=FRAME_SIZE):
+    """Inspect files across a process pool, writing every result as soon as it arrives. Returns a summary."""
+    workers = workers or os.cpu_count() or 1
+    max_pending = max(1, workers * prefetch)
+
+    jsonl_file = open(jsonl_path, "a") if jsonl_path else None
+    csv_file = open(csv_path, "a", newline="") if csv_path else None
+    csv_writer = None
+    if csv_file:
+        csv_writer = csv.DictWriter(csv_file, CSV_FIELDS)
+        if csv_file.tell() == 0:
+            csv_writer.writeheader()
+
+    summary = {"images": 0, "passed": 0, "failed": 0, "errors": 0}
+    start_time = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(board_model, version, match_mode, backend, threshold)) as pool:
+            pending = set()
+            remaining = iter(files)
+            while True:
+                # keep at most max_pending images in flight
+                for path in remaining:
+                    pending.add(pool.submit(_inspect_file, path, frame_size))
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    summary["images"] += 1
+                    if "error" in result:
+                        summary["errors"] += 1
+                        print(f"[WARNING] {result['image']}: {result['error']}")
+                    else:
+                        summary["passed" if result["passed"] else "failed"] += 1
+                        if csv_writer:
+                            csv_writer.writerows({"image": result["image"], **roi} for roi in result["rois"])
+                            csv_file.flush()
+                    if jsonl_file:
+                        jsonl_file.write(json.dumps(result) + "\n")
+                        jsonl_file.flush()
+
+                if summary["images"] % 100 < len(done):
+                    elapsed = time.perf_counter() - start_time
+                    print(f"{summary['images']}/{len(files)} images, {summary['images'] / elapsed:.1f} images/s")
+    finally:
+        if jsonl_file:
+            jsonl_file.close()
+        if csv_file:
+            csv_file.close()
+
+    elapsed = time.perf_counter() - start_time
+    summary["seconds"] = round(elapsed, 2)
+    summary["images_per_second"] = round(summary["images"] / elapsed, 2) if elapsed > 0 else 0.0
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-inspect captured board images against a recipe")
+    parser.add_argument("inputs", nargs="+", help="Image folders or glob patterns")
+    parser.add_argument("--model", help="Board model of the recipe")
+    parser.add_argument("--serial", help="Serial number to pick the recipe by, instead of --model")
+    parser.add_argument("--version", type=int, default=None, help="Recipe version, default: latest")
+    parser.add_argument("--jsonl", help="Append one JSON line per image to this file")
+    parser.add_argument("--csv", help="Append one row per image and ROI to this file")
+    parser.add_argument("--workers", type=int, default=None, help="Processes, default: all cores")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH, help="Images queued per worker")
+    parser.add_argument("--mode", choices=MATCH_MODES, default=MATCH_MODE)
+    parser.add_argument("--backend", default="opencv", help="Matching backend used by the full mode")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--width", type=int, default=FRAME_SIZE[0])
+    parser.add_argument("--height", type=int, default=FRAME_SIZE[1])
+    args = parser.parse_args()
+
+    if not args.jsonl and not args.csv:
+        parser.error("give --jsonl and/or --csv")
+
+    files = find_images(args.inputs)
+    if not files:
+        print("No images found")
+        sys.exit(1)
+
+    # resolve and load the recipe once here, this also writes its bundle so the workers only memory-map it
+    with InspectionEngine(backend="opencv", use_motion_gate=False) as engine:
+        version = engine.load_recipe(args.model, args.serial or "", args.version)
+        board_model = engine.board_model
+        if not engine.annotations:
+            print("Recipe has no usable ROIs")
+            sys.exit(1)
+    print(f"Inspecting {len(files)} images against {board_model or 'annotation_logs'} v{version}")
+
+    summary = run_batch(files, board_model, version, args.jsonl, args.csv, args.workers, args.prefetch,
+                        args.mode, args.backend, args.threshold, (args.width, args.height))
+    print(f"Done: {summary}")
+    sys.exit(1 if summary["errors"] else 0)
@@ -0,0 +1,402 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import unittest
+from datetime import datetime
+import cv2
+import numpy as np
+
+# Modules
+from Modules.Matching_backends import BACKENDS, create_backend, cuda_available
+from Modules.Inspection_engine import InspectionEngine, MATCH_MODES, draw_matches
+from Modules.Frame_source import open_source
+from Modules.Stage_timer import StageTimer
+
+# Benchmark parameters
+FRAME_SIZE = (1280, 720)  # Live view size the matcher runs at
+ROI_COUNTS = [5, 10, 25, 50, 100, 200]
+TEMPLATE_SIZE = (30, 120)  # Min/max template side in pixels
+REPEATS = 3
+
+# Suite parameters
+SUITE_RESOLUTIONS = [(1280, 720), (1920, 1080)]
+SUITE_COUNTS = [10, 50, 200]
+SUITE_TEMPLATE_SIZES = [(30, 60), (60, 120), (120, 240)]
+SUITE_MODES = ["tracked", "anchored", "full"]
+SUITE_FRAMES = 30  # Timed frames per case
+SUITE_JITTER = 3  # Max board shift between frames in pixels
+DISPLAY_SIZE = (1280, 720)  # Render stage target, like the live view
+
+
+def synthetic_frame(width, height, seed=0):
+    """Grayscale board-like frame: blurred noise with bright label blocks"""
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur((rng.random((height, width)) * 255).astype(np.uint8), (5, 5), 0)
+    for i in range(width * height // 20000):
+        x, y = int(rng.integers(0, width - 60)), int(rng.integers(0, height - 40))
+        w, h = int(rng.integers(20, 60)), int(rng.integers(10, 40))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), int(rng.integers(150, 255)), -1)
+        cv2.putText(frame, f"L{i}", (x + 2, y + h - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.4, 0, 1)
+    return frame
+
+
+def synthetic_rois(frame, count, size_range=TEMPLATE_SIZE, seed=1):
+    """Cut `count` templates out of the frame"""
+    rng = np.random.default_rng(seed)
+    height, width = frame.shape[:2]
+    rois = {}
+    for i in range(count):
+        w, h = int(rng.integers(*size_range)), int(rng.integers(*size_range))
+        x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+        rois[f"roi_{i}"] = frame[y:y + h, x:x + w].copy()
+    return rois
+
+
+def synthetic_board(width, height, count, size_range=TEMPLATE_SIZE, seed=0):
+    """BGR mainboard-like frame with `count` planted components.
+
+    Returns (frame, components), components are dicts with kind, x, y, width, height.
+    Labels are white stickers with text and a barcode, mylars are glossy amber films
+    blended over the board and foams are dark textured pads.
+    """
+    rng = np.random.default_rng(seed)
+
+    # green solder mask with copper traces and vias
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[:] = (40, 90, 30)
+    noise = rng.normal(0, 6, (height, width, 1))
+    frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+    for _ in range(width * height // 4000):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        if rng.random() < 0.5:
+            cv2.line(frame, (x, y), (x + int(rng.integers(-200, 200)), y), (60, 140, 170), 2)
+        else:
+            cv2.line(frame, (x, y), (x, y + int(rng.integers(-200, 200))), (60, 140, 170), 2)
+        cv2.circle(frame, (x, y), 3, (150, 170, 190), -1)
+
+    components = []
+    occupied = np.zeros((height, width), np.uint8)
+    attempts = 0
+    while len(components) < count and attempts < count * 50:
+        attempts += 1
+        w, h = int(rng.integers(*size_range)), int(rng.integers(*size_range))
+        if w >= width or h >= height:
+            continue
+        x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+        if occupied[y:y + h, x:x + w].any():
+            continue
+        occupied[y:y + h, x:x + w] = 1
+
+        kind = ("label", "mylar", "foam")[len(components) % 3]
+        patch = frame[y:y + h, x:x + w]
+        if kind == "label":
+            patch[:] = (235, 235, 230)
+            for bar in range(2, w - 2, 3):
+                if rng.random() < 0.6:
+                    cv2.line(patch, (bar, h // 2), (bar, h - 3), (20, 20, 20), 1)
+            cv2.putText(patch, f"{len(components):04d}", (2, max(10, h // 2 - 2)),
+                        cv2.FONT_HERSHEY_SIMPLEX, max(0.25, h / 120), (20, 20, 20), 1)
+        elif kind == "mylar":
+            film = np.full_like(patch, (40, 160, 220))
+            cv2.addWeighted(patch, 0.45, film, 0.55, 0, dst=patch)
+            cv2.line(patch, (0, 0), (w - 1, h - 1), (200, 230, 250), 1)  # glare
+        else:
+            texture = rng.integers(20, 60, (h, w, 1), dtype=np.uint8)
+            patch[:] = cv2.GaussianBlur(np.repeat(texture, 3, axis=2), (3, 3), 0)
+            cv2.rectangle(patch, (0, 0), (w - 1, h - 1), (70, 70, 70), 1)
+        components.append({"kind": kind, "x": x, "y": y, "width": w, "height": h})
+    return frame, components
+
+
+def jittered_frames(board, count, jitter=SUITE_JITTER, seed=0):
+    """Frames of the board shifted by a few pixels with sensor noise, like a board settling in the fixture"""
+    rng = np.random.default_rng(seed)
+    height, width = board.shape[:2]
+    frames = []
+    for _ in range(count):
+        dx, dy = rng.integers(-jitter, jitter + 1, 2)
+        shifted = cv2.warpAffine(board, np.float32([[1, 0, dx], [0, 1, dy]]), (width, height),
+                                 borderMode=cv2.BORDER_REPLICATE)
+        noise = rng.normal(0, 2, shifted.shape)
+        frames.append(np.clip(shifted + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(np.mean(samples_ms)), 3)}
+
+
+def render_stage(frame, matches, buffers):
+    """Headless part of FrameRenderer.render: fit to the display, draw the boxes, convert to RGBA"""
+    height, width = frame.shape[:2]
+    scale = min(DISPLAY_SIZE[0] / width, DISPLAY_SIZE[1] / height)
+    size = (int(width * scale), int(height * scale))
+    if buffers.get("size") != size:
+        buffers["size"] = size
+        buffers["resized"] = np.empty((size[1], size[0], 3), np.uint8)
+        buffers["rgba"] = np.empty((size[1], size[0], 4), np.uint8)
+    cv2.resize(frame, size, dst=buffers["resized"], interpolation=cv2.INTER_AREA)
+    draw_matches(buffers["resized"], matches, scale)
+    cv2.cvtColor(buffers["resized"], cv2.COLOR_BGR2RGBA, dst=buffers["rgba"])
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, None where the platform does not report it.
+
+    The peak never goes down, so it describes a whole run, per-case memory is peak_alloc_mb.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def suite_case(frames, annotations, templates, mode, backend):
+    """Time matching and rendering of every frame, returns the latency statistics of one case"""
+    with InspectionEngine(backend=backend, match_mode=mode, use_motion_gate=False) as engine:
+        tracemalloc.start()
+        engine.load_templates(annotations, templates)
+        engine.match(frames[0])  # warm-up, builds backend buffers
+
+        match_ms, render_ms, found = [], [], 0
+        buffers = {}
+        for frame in frames:
+            start_time = time.perf_counter()
+            matches = engine.match(frame)
+            match_ms.append((time.perf_counter() - start_time) * 1000)
+
+            start_time = time.perf_counter()
+            render_stage(frame, matches, buffers)
+            render_ms.append((time.perf_counter() - start_time) * 1000)
+            found += len(matches)
+
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        backend_name = engine.matching_backend.name if mode == "full" else None
+
+    total_ms = np.add(match_ms, render_ms)
+    return {
+        "backend": backend_name,
+        "match": percentiles(match_ms),
+        "render": percentiles(render_ms),
+        "frame": percentiles(total_ms),
+        "fps": round(1000 / float(np.mean(total_ms)), 2),
+        "found_ratio": round(found / (len(frames) * max(len(annotations), 1)), 3),
+        "peak_alloc_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+def run_suite(backend_names, modes=SUITE_MODES, roi_counts=SUITE_COUNTS, template_sizes=SUITE_TEMPLATE_SIZES,
+              resolutions=SUITE_RESOLUTIONS, frame_count=SUITE_FRAMES, seed=0):
+    """Sweep resolution x template size x ROI count x mode/backend on synthetic boards, returns the rows"""
+    rows = []
+    for width, height in resolutions:
+        for size_range in template_sizes:
+            board, components = synthetic_board(width, height, max(roi_counts), size_range, seed)
+            frames = jittered_frames(board, frame_count + 1, seed=seed)
+            gray = cv2.cvtColor(board, cv2.COLOR_BGR2GRAY)
+
+            for count in roi_counts:
+                if count > len(components):
+                    print(f"Skipping {count} ROIs at {width}x{height}, only {len(components)} components fit")
+                    continue
+                annotations, templates = [], {}
+                for i, comp in enumerate(components[:count]):
+                    key = f"{comp['kind']}_{i}.png"
+                    x, y, w, h = comp["x"], comp["y"], comp["width"], comp["height"]
+                    templates[key] = gray[y:y + h, x:x + w].copy()
+                    annotations.append({"roi_file": key, "x": x, "y": y, "width": w, "height": h})
+
+                # only the full mode uses the matching backend, the others run once
+                cases = [(mode, name) for mode in modes for name in (backend_names if mode == "full" else ["opencv"])]
+                for mode, name in cases:
+                    result = suite_case(frames, annotations, templates, mode, name)
+                    row = {"resolution": f"{width}x{height}", "template_size": list(size_range),
+                           "roi_count": count, "mode": mode, **result}
+                    rows.append(row)
+                    label = f"{mode}/{result['backend']}" if result["backend"] else mode
+                    print(f"{width}x{height} tpl {size_range[0]}-{size_range[1]} {count:>4} ROIs {label:<14} "
+                          f"p50 {row['frame']['p50_ms']:>8.2f} ms  p99 {row['frame']['p99_ms']:>8.2f} ms  "
+                          f"{row['fps']:>7.2f} fps  found {row['found_ratio']:.2f}")
+    return rows
+
+
+def replay_benchmark(source_spec, board_model=None, mode="tracked", fps=None, max_frames=None, preload=True):
+    """Run a recorded session through the live loop stages without a display, returns per-stage percentiles"""
+    source = open_source(source_spec, fps, loop=False, preload=preload)
+    if not source.isOpened():
+        raise RuntimeError(source.error_help())
+
+    timer = StageTimer(window=max_frames or 100000)
+    buffers = {}
+    frames = 0
+    with InspectionEngine(match_mode=mode, timer=timer) as engine:
+        engine.load_recipe(board_model)
+        if not engine.annotations:
+            source.release()
+            raise RuntimeError(f"Recipe {board_model or '(none, give --model)'} has no usable ROIs")
+        start_time = time.perf_counter()
+        while max_frames is None or frames < max_frames:
+            with timer.stage("read"):
+                ret, frame = source.read()
+            if not ret:
+                break
+            with timer.stage("resize"):
+                height, width = frame.shape[:2]
+                scale = min(DISPLAY_SIZE[0] / width, DISPLAY_SIZE[1] / height)
+                if scale != 1.0:
+                    frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            matches = engine.gated_match(frame)
+            with timer.stage("render"):
+                render_stage(frame, matches, buffers)
+            frames += 1
+        elapsed = time.perf_counter() - start_time
+        stats = engine.stats()
+    source.release()
+
+    print(f"{frames} frames from {source.describe()} in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.2f} fps)")
+    print(timer.report())
+    return {"source": source_spec, "board_model": board_model, "mode": mode, "frames": frames,
+            "seconds": round(elapsed, 3), "fps": round(frames / max(elapsed, 1e-9), 2),
+            "stages": timer.summary(), "engine": stats, "peak_rss_mb": peak_rss_mb()}
+
+
+def environment():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "cuda": cuda_available(),
+    }
+
+
+def available_backends():
+    return [name for name in BACKENDS if name != "cuda" or cuda_available()]
+
+
+def load_backend(name, rois, frame_shape):
+    backend = create_backend(name)
+    for key, roi_img in rois.items():
+        backend.load(key, roi_img)
+    backend.prepare(frame_shape)
+    return backend
+
+
+def time_backend(backend, frame, repeats):
+    """Per-frame time of matching every loaded template, warm-up frame excluded"""
+    backend.set_frame(frame)
+    backend.match_all(0.0)
+
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        backend.set_frame(frame)
+        backend.match_all(0.0)
+    return (time.perf_counter() - start_time) / repeats
+
+
+def backend_throughput(backend_names, roi_counts=ROI_COUNTS, frame_size=FRAME_SIZE, repeats=REPEATS,
+                       size_range=TEMPLATE_SIZE):
+    """Frames per second of each backend as the ROI count grows"""
+    frame = synthetic_frame(*frame_size)
+    rows = []
+    for count in roi_counts:
+        rois = synthetic_rois(frame, count, size_range)
+        line = f"{count:>4} ROIs:"
+        for name in backend_names:
+            seconds = time_backend(load_backend(name, rois, frame.shape), frame, repeats)
+            rows.append({
+                "backend": name,
+                "roi_count": count,
+                "frame_ms": round(seconds * 1000, 2),
+                "fps": round(1 / seconds, 2),
+            })
+            line += f" | {name} {seconds * 1000:>9.2f} ms ({1 / seconds:.2f} fps)"
+        print(line)
+    return rows
+
+
+def run_parity_tests():
+    """Run the backend parity tests of tests/test_matching_backends.py, returns True when they pass"""
+    tests_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+    suite = unittest.defaultTestLoader.discover(tests_dir, pattern="test_matching_backends.py")
+    return unittest.TextTestRunner(verbosity=2).run(suite).wasSuccessful()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ROI template matching throughput")
+    parser.add_argument("--backends", nargs="+", default=None, help="Backends to run, default: all available")
+    parser.add_argument("--parity", action="store_true", help="Run the backend parity tests and exit")
+    parser.add_argument("--suite", action="store_true",
+                        help="Full sweep on synthetic boards: latency percentiles, fps and memory per case")
+    parser.add_argument("--modes", nargs="+", choices=MATCH_MODES, default=SUITE_MODES, help="Suite match modes")
+    parser.add_argument("--resolutions", nargs="+", default=None, metavar="WxH",
+                        help="Suite frame sizes, default: " + " ".join(f"{w}x{h}" for w, h in SUITE_RESOLUTIONS))
+    parser.add_argument("--template-sizes", type=int, nargs="+", default=None, metavar="MIN MAX",
+                        help="Suite template side ranges as MIN MAX pairs")
+    parser.add_argument("--frames", type=int, default=SUITE_FRAMES, help="Suite frames per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", metavar="SOURCE",
+                        help="Run a recorded session (video, image folder or glob) through the live loop stages")
+    parser.add_argument("--model", help="Recipe board model for --replay")
+    parser.add_argument("--mode", choices=MATCH_MODES, default="tracked", help="Match mode for --replay")
+    parser.add_argument("--fps", type=float, default=None, help="Replay rate for --replay, default: as fast as possible")
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop --replay after this many frames")
+    parser.add_argument("--counts", type=int, nargs="+", default=None, help="ROI counts to sweep")
+    parser.add_argument("--width", type=int, default=FRAME_SIZE[0])
+    parser.add_argument("--height", type=int, default=FRAME_SIZE[1])
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--template-size", type=int, nargs=2, default=TEMPLATE_SIZE, metavar=("MIN", "MAX"),
+                        help="Template side range in pixels")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    backend_names = args.backends or available_backends()
+
+    if args.parity:
+        sys.exit(0 if run_parity_tests() else 1)
+
+    if args.replay:
+        try:
+            replay = replay_benchmark(args.replay, args.model, args.mode, args.fps, args.max_frames)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        results = {"environment": environment(), "replay": replay}
+    elif args.suite:
+        resolutions = SUITE_RESOLUTIONS
+        if args.resolutions:
+            resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions]
+        template_sizes = SUITE_TEMPLATE_SIZES
+        if args.template_sizes:
+            if len(args.template_sizes) % 2:
+                parser.error("--template-sizes takes MIN MAX pairs")
+            template_sizes = list(zip(args.template_sizes[::2], args.template_sizes[1::2]))
+        rows = run_suite(backend_names, args.modes, args.counts or SUITE_COUNTS, template_sizes, resolutions,
+                         args.frames, args.seed)
+        results = {
+            "environment": environment(),
+            "parameters": {"backends": backend_names, "modes": args.modes, "roi_counts": args.counts or SUITE_COUNTS,
+                           "template_sizes": template_sizes, "resolutions": resolutions,
+                           "frames": args.frames, "seed": args.seed},
+            "peak_rss_mb": peak_rss_mb(),
+            "results": rows,
+        }
+    else:
+        results = backend_throughput(backend_names, args.counts or ROI_COUNTS, (args.width, args.height),
+                                     args.repeats, tuple(args.template_size))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
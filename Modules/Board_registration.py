@@ -0,0 +1,85 @@
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Registration parameters
+REGISTRATION_SCALE = 0.5  # Features are computed on a downscaled frame
+MAX_FEATURES = 1000
+MIN_INLIERS = 15
+RANSAC_THRESHOLD = 3.0  # Pixels at the downscaled size
+
+
+def warp_point(transform, x, y):
+    """Map a golden board point (x, y) into the live frame with a 2x3 transform"""
+    px = transform[0, 0] * x + transform[0, 1] * y + transform[0, 2]
+    py = transform[1, 0] * x + transform[1, 1] * y + transform[1, 2]
+    return int(round(px)), int(round(py))
+
+
+class BoardRegistration:
+    """Estimate the golden-board-to-live-frame transform once per frame"""
+    def __init__(self, golden_gray, scale=REGISTRATION_SCALE, max_features=MAX_FEATURES, min_inliers=MIN_INLIERS):
+        self.scale = scale
+        self.min_inliers = min_inliers
+        self.orb = cv2.ORB_create(max_features)
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+
+        small = self._downscale(golden_gray)
+        self.golden_kp, self.golden_des = self.orb.detectAndCompute(small, None)
+        if self.golden_des is None:
+            logger.warning("Golden board has no features, registration disabled")
+
+        # last estimate, identity until the first successful registration
+        self.transform = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+        self.confidence = 0.0
+        self.inliers = 0
+
+    def _downscale(self, gray):
+        if self.scale == 1.0:
+            return gray
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def features(self, gray):
+        """ORB (keypoints, descriptors) of a live frame, registrations with the same settings can share them"""
+        return self.orb.detectAndCompute(self._downscale(gray), None)
+
+    def estimate(self, gray, features=None):
+        """Estimate the transform for a grayscale live frame.
+
+        features are the frame's (keypoints, descriptors) from features(), computed here
+        when not given. Returns (transform, confidence). transform is a 2x3 similarity
+        transform in full resolution coordinates, confidence is the RANSAC inlier ratio
+        and is 0.0 when the registration cannot be trusted.
+        """
+        self.confidence = 0.0
+        self.inliers = 0
+        if self.golden_des is None:
+            return self.transform, self.confidence
+
+        kp, des = features if features is not None else self.features(gray)
+        if des is None:
+            return self.transform, self.confidence
+
+        matches = self.matcher.match(self.golden_des, des)
+        if len(matches) < self.min_inliers:
+            return self.transform, self.confidence
+
+        src = np.float32([self.golden_kp[m.queryIdx].pt for m in matches])
+        dst = np.float32([kp[m.trainIdx].pt for m in matches])
+        transform, inliers = cv2.estimateAffinePartial2D(
+            src, dst, method=cv2.RANSAC, ransacReprojThreshold=RANSAC_THRESHOLD
+        )
+        if transform is None:
+            return self.transform, self.confidence
+
+        self.inliers = int(inliers.sum())
+        if self.inliers < self.min_inliers:
+            return self.transform, self.confidence
+
+        # Rotation/scale are the same at any size, only the translation scales
+        transform[:, 2] /= self.scale
+        self.transform = transform
+        self.confidence = self.inliers / len(matches)
+        return self.transform, self.confidence
@@ -0,0 +1,274 @@
+import os
+import re
+import pty
+import time
+import queue
+import select
+import signal
+import termios
+import threading
+import subprocess
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+GPHOTO2 = os.environ.get("SHARPEYE_GPHOTO2", "gphoto2")  # a fake executable can stand in for tests
+OUTPUT_DIR = "/home/nvidia/Main_Folder/Inspected_images/Captured_Images"
+FILENAME_PATTERN = "photo_%Y%m%d_%H%M%S_%n.%C"  # gphoto2 pattern, %n keeps captures within one second apart
+SUPPORTED_MODELS = ("Canon EOS R10", "USB PTP Class Camera")
+PTP_CLASS_MODEL = "Canon EOS R10"  # the R10 sometimes enumerates as a generic PTP camera
+START_TIMEOUT = 15  # s for the shell to open the camera and show its prompt
+CAPTURE_TIMEOUT = 20  # s for one capture and download
+CAPTURE_RETRIES = 1  # restarts of the session for one failed capture
+CLOSE_TIMEOUT = 1.0  # s close() waits for a running capture before ending gphoto2, it runs on app exit
+
+PROMPT = re.compile(r"gphoto2: \{[^}]*\}[^\n]*> $")
+SAVED_FILE = re.compile(r"Saving file as ([^\r\n]+)")
+ERROR_LINE = re.compile(r"\*\*\* Error[^\n]*\n?(?:[^\n]*\n?){0,3}")
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]|\x1b[=>]")
+
+
+class CameraError(Exception):
+    pass
+
+
+def detect_cameras(executable=GPHOTO2, timeout=10):
+    """Return [(model, port)] listed by gphoto2 --auto-detect"""
+    result = subprocess.run([executable, "--auto-detect"], capture_output=True, text=True, timeout=timeout)
+    cameras = []
+    past_header = False
+    for line in result.stdout.splitlines():
+        if line.startswith("---"):
+            past_header = True
+        elif past_header and line.strip():
+            parts = re.split(r"\s{2,}", line.strip())
+            if len(parts) >= 2:
+                cameras.append((parts[0], parts[-1]))
+    return cameras
+
+
+def unmount_camera(port):
+    """Release the camera from the desktop automounter, which otherwise keeps the PTP device busy"""
+    match = re.match(r"usb:(\d+),(\d+)", port or "")
+    if not match:
+        return
+    try:
+        subprocess.run(["udisksctl", "unmount", "-b", f"/dev/bus/usb/{match.group(1)}/{match.group(2)}"],
+                       capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+
+class CameraSession:
+    """One long-lived gphoto2 shell that keeps the PTP session to the DSLR open.
+
+    Detection and the USB port are cached, so a capture only costs the capture and the
+    download. Captures run one at a time on the session thread: capture() returns a
+    Future resolving to {"path", "capture_ms", "queued_ms"}, and pressing capture again
+    while one is in flight returns that same Future instead of firing the shutter twice.
+    A capture that fails or times out restarts the shell and is retried once.
+    """
+    def __init__(self, output_dir=OUTPUT_DIR, executable=GPHOTO2, filename_pattern=FILENAME_PATTERN,
+                 start_timeout=START_TIMEOUT, capture_timeout=CAPTURE_TIMEOUT, retries=CAPTURE_RETRIES):
+        self.output_dir = output_dir
+        self.executable = executable
+        self.filename_pattern = filename_pattern
+        self.start_timeout = start_timeout
+        self.capture_timeout = capture_timeout
+        self.retries = retries
+
+        self.model = None
+        self.port = None
+        self.proc = None
+        self.master_fd = None
+        self._buffer = ""
+
+        self._requests = queue.Queue()
+        self._pending = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closing = False
+
+        # counters
+        self.captures = 0
+        self.restarts = 0
+
+    def detect(self):
+        """Find the camera and cache its model and port, returns False when none is connected"""
+        for model, port in detect_cameras(self.executable):
+            if model in SUPPORTED_MODELS:
+                self.model = PTP_CLASS_MODEL if model == "USB PTP Class Camera" else model
+                self.port = port
+                logger.info(f"Camera {model} on {port}")
+                return True
+        return False
+
+    def open(self):
+        """Start the gphoto2 shell on the cached camera and wait for its prompt"""
+        if self.is_open():
+            return
+        if self.port is None and not self.detect():
+            raise CameraError("Camera not detected")
+        unmount_camera(self.port)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # a pty keeps gphoto2's output line buffered, through a pipe it would sit in stdio buffers
+        master_fd, slave_fd = pty.openpty()
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+        cmd = [self.executable, "--camera", self.model, "--port", self.port, "--force-overwrite",
+               "--filename", os.path.join(self.output_dir, self.filename_pattern), "--shell"]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
+                                         env={**os.environ, "TERM": "dumb"}, start_new_session=True)
+        except OSError:
+            os.close(master_fd)
+            raise
+        finally:
+            os.close(slave_fd)
+        self.master_fd = master_fd
+        self._buffer = ""
+
+        start_time = time.perf_counter()
+        try:
+            self._read_until_prompt(self.start_timeout)
+        except CameraError:
+            self.close_shell()
+            raise
+        logger.info(f"gphoto2 session open in {time.perf_counter() - start_time:.2f}s")
+
+    def is_open(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        """Start the session thread, captures are queued to it"""
+        if self._thread is None or not self._thread.is_alive():
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def capture(self):
+        """Queue a capture and download, returns a Future of {"path", "capture_ms", "queued_ms"}"""
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return self._pending
+            future = Future()
+            self._pending = future
+            self._requests.put((future, time.perf_counter()))
+        self.start()
+        return future
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Stop the session thread and close the shell, a running capture is aborted after timeout seconds"""
+        self._closing = True
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._requests.put(None)
+            thread.join(timeout)
+            if thread.is_alive():
+                # still capturing, ending gphoto2 makes the capture fail right away
+                self._kill_shell()
+                thread.join(timeout)
+        self._thread = None
+        if thread is None or not thread.is_alive():
+            self.close_shell(timeout)
+
+    def close_shell(self, timeout=2):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                try:
+                    self._send("exit")
+                    self.proc.wait(timeout=timeout)
+                except (OSError, subprocess.TimeoutExpired):
+                    self._kill_shell()
+                    self.proc.wait()
+            self.proc = None
+        if self.master_fd is not None:
+            os.close(self.master_fd)
+            self.master_fd = None
+
+    def _kill_shell(self):
+        proc = self.proc
+        if proc is not None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            future, queued_at = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._capture_with_restart()
+                result["queued_ms"] = round((time.perf_counter() - queued_at) * 1000, 1)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+
+    def _capture_with_restart(self):
+        for attempt in range(self.retries + 1):
+            if self._closing:
+                break
+            try:
+                self.open()
+                return self._capture()
+            except (CameraError, OSError) as e:
+                self.close_shell()
+                if self._closing:
+                    break
+                logger.error(f"Capture failed ({e}), restarting gphoto2 session")
+                self.restarts += 1
+                if attempt:
+                    self.port = None  # the camera may have come back on another USB address
+        if self._closing:
+            raise CameraError("Camera session closed")
+        raise CameraError(f"Capture failed after {self.retries + 1} attempts")
+
+    def _capture(self):
+        start_time = time.perf_counter()
+        self._send("capture-image-and-download")
+        output = self._read_until_prompt(self.capture_timeout)
+        saved = [path.strip() for path in SAVED_FILE.findall(output)]
+        if not saved:
+            error = ERROR_LINE.search(output)
+            raise CameraError(error.group(0).strip() if error else f"no file downloaded: {output.strip()[-200:]}")
+        # with RAW+JPEG both files are downloaded, the JPEG is the one shown
+        path = next((p for p in saved if p.lower().endswith((".jpg", ".jpeg"))), saved[-1])
+        self.captures += 1
+        capture_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(f"Photo captured and saved to {path} in {capture_ms:.0f} ms")
+        return {"path": path, "files": saved, "capture_ms": round(capture_ms, 1)}
+
+    def _send(self, command):
+        os.write(self.master_fd, (command + "\n").encode())
+
+    def _read_until_prompt(self, timeout):
+        """Output of the shell up to its next prompt"""
+        deadline = time.monotonic() + timeout
+        while True:
+            match = PROMPT.search(self._buffer)
+            if match:
+                output = self._buffer[:match.start()]
+                self._buffer = self._buffer[match.end():]
+                return output.replace("\r\n", "\n")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CameraError(f"gphoto2 did not answer within {timeout}s")
+            ready, _, _ = select.select([self.master_fd], [], [], remaining)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master_fd, 4096)
+            except OSError:
+                data = b""  # EIO once the shell exited
+            if not data:
+                raise CameraError(f"gphoto2 exited: {self._buffer.strip()[-200:]}")
+            self._buffer += ANSI_ESCAPE.sub("", data.decode("utf-8", errors="replace"))
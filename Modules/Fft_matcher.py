@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+
+# Windows with less variance than this are treated as flat and score 0
+FLAT_VARIANCE = 1e-3
+
+
+class FftMatcher:
+    """TM_CCOEFF_NORMED for many templates that share one frame spectrum per frame.
+
+    The frame DFT and its integral tables are computed once in set_frame(), each
+    template then costs one spectrum multiply and one inverse DFT. Template spectra
+    are cached per DFT size, call prepare() at load time to build them up front.
+    """
+    def __init__(self):
+        self.templates = {}  # key -> (zero-mean float32 template, sum of squares)
+        self.template_spectra = {}  # (key, dft_size) -> spectrum
+        self.dft_size = None
+        self.frame_shape = None
+        self.frame_spectrum = None
+        self.frame_sum = None
+        self.frame_sqsum = None
+        self.variance_cache = {}  # (h, w) -> window variance of the current frame
+
+    def add_template(self, key, roi_img):
+        """Register a grayscale template under key"""
+        template = roi_img.astype(np.float32)
+        template -= template.mean()
+        self.templates[key] = (template, float(np.sum(template.astype(np.float64) ** 2)))
+        # drop spectra computed for an older template with the same key
+        for cached in [k for k in self.template_spectra if k[0] == key]:
+            del self.template_spectra[cached]
+
+    def remove_template(self, key):
+        self.templates.pop(key, None)
+        for cached in [k for k in self.template_spectra if k[0] == key]:
+            del self.template_spectra[cached]
+
+    def clear(self):
+        self.templates = {}
+        self.template_spectra = {}
+
+    def _dft_size(self, frame_shape):
+        return cv2.getOptimalDFTSize(frame_shape[0]), cv2.getOptimalDFTSize(frame_shape[1])
+
+    def _template_spectrum(self, key, dft_size):
+        spectrum = self.template_spectra.get((key, dft_size))
+        if spectrum is None:
+            template = self.templates[key][0]
+            padded = np.zeros(dft_size, np.float32)
+            padded[:template.shape[0], :template.shape[1]] = template
+            spectrum = cv2.dft(padded)
+            self.template_spectra[(key, dft_size)] = spectrum
+        return spectrum
+
+    def prepare(self, frame_shape):
+        """Precompute all template spectra for frames of this shape"""
+        dft_size = self._dft_size(frame_shape)
+        for key in self.templates:
+            self._template_spectrum(key, dft_size)
+
+    def set_frame(self, gray):
+        """Compute the frame spectrum and integral tables, shared by every match() until the next frame"""
+        self.frame_shape = gray.shape[:2]
+        self.dft_size = self._dft_size(self.frame_shape)
+
+        padded = np.zeros(self.dft_size, np.float32)
+        padded[:gray.shape[0], :gray.shape[1]] = gray
+        self.frame_spectrum = cv2.dft(padded)
+        self.frame_sum, self.frame_sqsum = cv2.integral2(gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        self.variance_cache = {}
+
+    def _window_sums(self, table, h, w):
+        """Sum of every h x w window, shape (H - h + 1, W - w + 1)"""
+        return cv2.subtract(cv2.add(table[h:, w:], table[:-h, :-w]), cv2.add(table[:-h, w:], table[h:, :-w]))
+
+    def _window_variance(self, h, w):
+        """Unnormalized variance of every h x w window, flat windows set to 0, cached per size and frame"""
+        variance = self.variance_cache.get((h, w))
+        if variance is None:
+            n = h * w
+            window_sum = self._window_sums(self.frame_sum, h, w)
+            window_sqsum = self._window_sums(self.frame_sqsum, h, w)
+            variance = cv2.subtract(window_sqsum, cv2.multiply(window_sum, window_sum, scale=1.0 / n))
+            _, variance = cv2.threshold(variance.astype(np.float32), FLAT_VARIANCE * n, 0, cv2.THRESH_TOZERO)
+            self.variance_cache[(h, w)] = variance
+        return variance
+
+    def score_map(self, key):
+        """Full TM_CCOEFF_NORMED result for one template on the current frame, None if it does not fit"""
+        template, template_sqsum = self.templates[key]
+        h, w = template.shape[:2]
+        frame_h, frame_w = self.frame_shape
+        if h > frame_h or w > frame_w:
+            return None
+
+        # same as OpenCV: a flat template scores 1 everywhere, a flat window scores 0
+        if template_sqsum == 0:
+            return np.ones((frame_h - h + 1, frame_w - w + 1), np.float32)
+
+        # numerator: correlation with the zero-mean template, window mean cancels out
+        product = cv2.mulSpectrums(self.frame_spectrum, self._template_spectrum(key, self.dft_size), 0, conjB=True)
+        corr = cv2.idft(product, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT)
+        corr = corr[:frame_h - h + 1, :frame_w - w + 1]
+
+        # denominator: template energy times window variance, flat windows score 0
+        denom = cv2.sqrt(self._window_variance(h, w) * np.float32(template_sqsum))
+        scores = np.zeros(corr.shape, np.float32)
+        np.divide(corr, denom, out=scores, where=denom > 0)
+        return np.clip(scores, -1.0, 1.0, out=scores)
+
+    def match(self, key):
+        """Best (max_val, max_loc) for one template on the current frame, None if it does not fit"""
+        scores = self.score_map(key)
+        if scores is None:
+            return None
+        _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+        return max_val, max_loc
+
+    def match_all(self, keys=None):
+        """Match every template (or the given keys) on the current frame, returns {key: (max_val, max_loc)}"""
+        results = {}
+        for key in (self.templates if keys is None else keys):
+            match = self.match(key)
+            if match is not None:
+                results[key] = match
+        return results
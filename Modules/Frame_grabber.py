@@ -0,0 +1,133 @@
+import time
+import threading
+import logging
+
+from Modules.Stage_timer import StageTimer
+
+logger = logging.getLogger(__name__)
+
+STALE_FRAMES_ON_RESUME = 1  # Frames the capture may still hold from before a pause
+
+class FrameGrabber:
+    """Read frames from a VideoCapture on a background thread into a latest-frame slot.
+
+    pause() stops consuming frames while the capture stays open, so switching back
+    with resume() costs no pipeline renegotiation.
+    """
+    def __init__(self, cap, max_failures=30, timer=None):
+        self.cap = cap
+        self.max_failures = max_failures
+        self.timer = timer or StageTimer()
+        self.running = False
+        self.failed = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._active = threading.Event()  # cleared while paused
+        self._active.set()
+        self._skip_frames = 0
+
+        # latest-frame slot
+        self._frame = None
+        self._frame_seq = 0
+        self._frame_time = 0.0
+        self._consumed_seq = 0
+
+        # counters
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.pauses = 0
+
+    def start(self):
+        """Start grabbing frames in a thread"""
+        if self.running:
+            return
+        self.running = True
+        self.failed = False
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop grabbing frames and wait for the thread to exit"""
+        self.running = False
+        self._active.set()  # wake a paused loop so it can exit
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def pause(self):
+        """Stop reading frames, the capture stays open"""
+        if self._active.is_set():
+            self._active.clear()
+            self.pauses += 1
+
+    def resume(self):
+        """Read frames again, the slot stays empty until a frame newer than the pause arrives"""
+        with self._lock:
+            self._frame = None
+            self._skip_frames = STALE_FRAMES_ON_RESUME
+        self._active.set()
+
+    @property
+    def paused(self):
+        return not self._active.is_set()
+
+    def _grab_loop(self):
+        """Continuously read from the capture, the newest frame always wins"""
+        consecutive_failures = 0
+        while self.running:
+            if not self._active.is_set():
+                self._active.wait(0.1)
+                continue
+            try:
+                with self.timer.stage("cap.read"):
+                    ret, frame = self.cap.read()
+            except Exception as e:
+                logger.error(f"Frame grab error: {e}")
+                ret, frame = False, None
+
+            if not ret:
+                self.read_failures += 1
+                consecutive_failures += 1
+                if consecutive_failures >= self.max_failures:
+                    logger.error("Frame grabber stopped: too many failed reads")
+                    self.failed = True
+                    self.running = False
+                    break
+                time.sleep(0.01)
+                continue
+
+            consecutive_failures = 0
+            with self._lock:
+                if self._skip_frames:
+                    self._skip_frames -= 1
+                    continue
+                if not self._active.is_set():
+                    continue  # read finished after pause(), resume() starts from a fresh frame
+                # previous frame was never picked up by a consumer
+                if self._frame is not None and self._consumed_seq != self._frame_seq:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._frame_seq += 1
+                self._frame_time = time.time()
+                self.frames_read += 1
+
+    def latest(self):
+        """Return (seq, timestamp, frame) of the newest frame without blocking.
+
+        frame is None until the first frame has been read. The same frame may be
+        returned more than once, compare seq to detect new frames.
+        """
+        with self._lock:
+            self._consumed_seq = self._frame_seq
+            return self._frame_seq, self._frame_time, self._frame
+
+    def stats(self):
+        """Return the grabber counters as a dictionary"""
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "read_failures": self.read_failures,
+            "pauses": self.pauses,
+            "last_seq": self._frame_seq,
+        }
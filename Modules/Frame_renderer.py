@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import tkinter as tk
+from PIL import Image, ImageTk
+
+from Modules.Inspection_engine import draw_matches
+from Modules.Stage_timer import StageTimer
+
+
+class FrameRenderer:
+    """Draw frames on a canvas through one image item and one PhotoImage updated in place.
+
+    The resize and colour conversion write into preallocated buffers, which are
+    only reallocated when the display size changes.
+    """
+    def __init__(self, canvas, max_width, max_height, timer=None):
+        self.canvas = canvas
+        self.timer = timer or StageTimer()
+        self.max_width = max_width
+        self.max_height = max_height
+        self.display_size = None  # (width, height)
+        self.resized = None  # BGR buffer at display size
+        self.rgba = None  # RGBA buffer at display size
+        self.rgba_image = None  # PIL view on the RGBA buffer
+        self.photo = None
+        self.image_item = None
+        self.scale = 1.0
+
+    def display_geometry(self, frame_shape):
+        """Return (scale, width, height) of a frame fitted into the display area"""
+        frame_height, frame_width = frame_shape[:2]
+        scale = min(self.max_width / frame_width, self.max_height / frame_height)
+        return scale, int(frame_width * scale), int(frame_height * scale)
+
+    def _allocate(self, width, height):
+        self.display_size = (width, height)
+        self.resized = np.empty((height, width, 3), np.uint8)
+        # PIL only shares the buffer memory for 4-byte pixels, so paste() always reads the latest frame
+        self.rgba = np.empty((height, width, 4), np.uint8)
+        self.rgba_image = Image.frombuffer("RGBA", (width, height), self.rgba, "raw", "RGBA", 0, 1)
+        self.photo = ImageTk.PhotoImage("RGBA", (width, height))
+        if self.image_item is not None:
+            self.canvas.itemconfigure(self.image_item, image=self.photo)
+
+    def _center(self):
+        canvas_width = max(self.canvas.winfo_width(), 1)
+        canvas_height = max(self.canvas.winfo_height(), 1)
+        return canvas_width // 2, canvas_height // 2
+
+    def render(self, frame, matches=None):
+        """Draw a BGR frame and its (top_left, bottom_right, roi_file, score) matches"""
+        if frame is None or frame.size == 0:
+            return
+
+        scale, width, height = self.display_geometry(frame.shape)
+        if width <= 0 or height <= 0:
+            return
+        if self.display_size != (width, height):
+            self._allocate(width, height)
+        self.scale = scale
+
+        # Draw matches at display scale
+        with self.timer.stage("overlay"):
+            if frame.shape[1] == width and frame.shape[0] == height:
+                np.copyto(self.resized, frame)
+            else:
+                cv2.resize(frame, (width, height), dst=self.resized, interpolation=cv2.INTER_AREA)
+            draw_matches(self.resized, matches, scale)
+
+        with self.timer.stage("photo"):
+            cv2.cvtColor(self.resized, cv2.COLOR_BGR2RGBA, dst=self.rgba)
+            self.photo.paste(self.rgba_image)
+
+        with self.timer.stage("canvas"):
+            center_x, center_y = self._center()
+            if self.image_item is None:
+                self.image_item = self.canvas.create_image(center_x, center_y, image=self.photo, anchor=tk.CENTER)
+                self.canvas.tag_lower(self.image_item)
+            else:
+                self.canvas.coords(self.image_item, center_x, center_y)
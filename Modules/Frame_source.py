@@ -0,0 +1,213 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import logging
+import cv2
+
+logger = logging.getLogger(__name__)
+
+DEVICE_PATH = "/dev/video0"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def gstreamer_pipeline(device=DEVICE_PATH, width=1920, height=1080, fps=30):
+    """MJPEG USB camera pipeline: CPU JPEG decoding, GPU format conversion, BGR appsink.
+
+    The appsink keeps only the newest frame, so a paused reader neither queues up
+    memory nor sees a backlog of old frames when it resumes.
+    """
+    return (
+        f"v4l2src device={device} ! "
+        f"image/jpeg,width={width},height={height},framerate={fps}/1 ! "
+        "jpegdec ! video/x-raw ! "  # CPU-based JPEG decoding
+        "nvvidconv ! video/x-raw,format=BGRx ! "  # GPU-based format conversion
+        "videoconvert ! video/x-raw,format=BGR ! "
+        "appsink max-buffers=1 drop=true sync=false"
+    )
+
+
+class FrameSource:
+    """Common interface of every frame source, the VideoCapture calls FrameGrabber uses.
+
+    read() returns (ret, frame) like cv2.VideoCapture, so sources are interchangeable
+    with a plain capture.
+    """
+    def isOpened(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def describe(self):
+        return self.__class__.__name__
+
+    def error_help(self):
+        """What to check when the source does not open"""
+        return ""
+
+
+class GStreamerSource(FrameSource):
+    """Live camera through a GStreamer pipeline"""
+    def __init__(self, device=DEVICE_PATH, width=1920, height=1080, fps=30, pipeline=None):
+        self.device = device
+        self.pipeline = pipeline or gstreamer_pipeline(device, width, height, fps)
+        self.cap = cv2.VideoCapture(self.pipeline, cv2.CAP_GSTREAMER)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+    def describe(self):
+        return f"camera {self.device}"
+
+    def error_help(self):
+        return (
+            f"Error: Could not open device {self.device}. "
+            "Device may be busy or pipeline is incorrect.\n"
+            f"Test pipeline: gst-launch-1.0 {self.pipeline.split('appsink')[0]}autovideosink\n"
+            f"Check: lsof {self.device} and kill any processes using it.\n"
+            f"Verify formats: v4l2-ctl --list-formats-ext -d {self.device}"
+        )
+
+
+class ReplaySource(FrameSource):
+    """Replay a recorded video file, image folder or glob of images.
+
+    fps=None delivers frames as fast as they are read, otherwise read() paces them
+    to a fixed rate. With loop=True the recording starts over at the end, otherwise
+    read() returns (False, None) like a camera that went away. preload=True decodes
+    an image sequence once up front, so replays measure the pipeline and not the decoder.
+    """
+    def __init__(self, path, fps=None, loop=False, preload=False):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.cap = None
+        self.files = []
+        self.frames = None
+        self.index = 0
+        self.next_time = None
+
+        # counters
+        self.frames_delivered = 0
+        self.loops = 0
+
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif any(c in path for c in "*?["):
+            self.files = sorted(p for p in glob.glob(path) if p.lower().endswith(IMAGE_EXTENSIONS))
+        elif os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+            self.files = [path]
+        else:
+            self.cap = cv2.VideoCapture(path)
+
+        if preload and self.files:
+            self.frames = [frame for frame in (cv2.imread(f) for f in self.files) if frame is not None]
+
+    def isOpened(self):
+        if self.cap is not None:
+            return self.cap.isOpened()
+        return bool(self.files)
+
+    def _next_frame(self):
+        if self.cap is not None:
+            ret, frame = self.cap.read()
+            if not ret and self.loop and self.frames_delivered:
+                self.loops += 1
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+            return frame if ret else None
+
+        count = len(self.frames) if self.frames is not None else len(self.files)
+        while count:
+            if self.index >= count:
+                if not self.loop:
+                    return None
+                self.loops += 1
+                self.index = 0
+            i = self.index
+            self.index += 1
+            frame = self.frames[i] if self.frames is not None else cv2.imread(self.files[i])
+            if frame is not None:
+                return frame.copy() if self.frames is not None else frame
+            logger.warning(f"Skipping unreadable replay image {self.files[i]}")
+        return None
+
+    def read(self):
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+
+        # fixed rate: wait for this frame's slot, fall behind rather than burst to catch up
+        if self.fps:
+            now = time.perf_counter()
+            if self.next_time is None or now - self.next_time > 1.0:
+                self.next_time = now
+            delay = self.next_time - now
+            if delay > 0:
+                time.sleep(delay)
+            self.next_time += 1.0 / self.fps
+
+        self.frames_delivered += 1
+        return True, frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.frames = None
+
+    def describe(self):
+        rate = f"{self.fps} fps" if self.fps else "as fast as possible"
+        return f"replay {self.path} ({rate}{', looping' if self.loop else ''})"
+
+    def error_help(self):
+        return f"Error: Could not open replay source {self.path}, expected a video file, image folder or glob."
+
+
+def open_source(spec=DEVICE_PATH, fps=None, loop=False, preload=False):
+    """Open a frame source: a /dev/video* device for the live camera, anything else is replayed"""
+    spec = str(spec)
+    if spec.startswith("/dev/video"):
+        return GStreamerSource(spec)
+    return ReplaySource(spec, fps, loop, preload)
+
+
+def record(source, folder, frame_count, extension=".jpg"):
+    """Save frame_count frames of a source as a numbered image sequence for later replay"""
+    os.makedirs(folder, exist_ok=True)
+    saved = 0
+    while saved < frame_count:
+        ret, frame = source.read()
+        if not ret:
+            break
+        cv2.imwrite(os.path.join(folder, f"frame_{saved:06d}{extension}"), frame)
+        saved += 1
+    return saved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a session from a frame source as an image sequence")
+    parser.add_argument("source", help="/dev/videoN, video file, image folder or glob")
+    parser.add_argument("folder", help="Output folder")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--png", action="store_true", help="Lossless PNG instead of JPEG")
+    args = parser.parse_args()
+
+    source = open_source(args.source)
+    if not source.isOpened():
+        print(source.error_help())
+        sys.exit(1)
+    saved = record(source, args.folder, args.frames, ".png" if args.png else ".jpg")
+    source.release()
+    print(f"Recorded {saved} frames from {source.describe()} to {args.folder}")
@@ -0,0 +1,461 @@
+import os
+import time
+import threading
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+
+from Modules.Load_annotations import AnnotationLoader, DECODE_WORKERS
+from Modules.Recipe_store import RecipeStore
+from Modules.Inspection_pipeline import InspectionPipeline
+from Modules.Template_matching import build_pyramid, pyramid_match, pyramid_deviation, anchored_match
+from Modules.Board_registration import BoardRegistration, warp_point
+from Modules.Matching_backends import create_backend
+from Modules.Motion_gate import MotionGate
+from Modules.Roi_tracker import RoiTracker
+from Modules.Stage_timer import StageTimer
+
+BOX_COLOR = (0, 0, 255)  # Red in BGR
+
+# "tracked" = follow each ROI near its last hit, global search only for lost ROIs
+# "registered" = register the whole board, then verify each ROI at its warped position, full search when that fails
+# "anchored" = search around the annotated position, pyramid then full search when lost
+# "pyramid" = coarse-to-fine CPU matching, "full" = full-frame search on the matching backend
+MATCH_MODES = ("tracked", "registered", "anchored", "pyramid", "full")
+
+
+def draw_matches(image, matches, scale=1.0, color=BOX_COLOR):
+    """Draw (top_left, bottom_right, roi_file, score) matches into a BGR image, coordinates scaled by scale"""
+    for top_left, bottom_right, roi_file, score in matches or []:
+        p1 = (int(top_left[0] * scale), int(top_left[1] * scale))
+        p2 = (int(bottom_right[0] * scale), int(bottom_right[1] * scale))
+        display_name = os.path.splitext(os.path.basename(roi_file))[0]
+        cv2.rectangle(image, p1, p2, color, 2)
+        cv2.putText(image, f"{display_name} - ({score:.2f})", (p1[0], max(0, p1[1] - 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
+    return image
+
+
+class InspectionEngine:
+    """Headless ROI inspection: load a recipe, feed BGR frames, get matches or structured results.
+
+    Nothing here needs a display, so the Tk app, batch jobs and benchmarks share it.
+    The matching backend is created by open(), which probes CUDA for "auto" and can be
+    slow, so callers decide when to pay for it.
+    """
+    def __init__(self, backend="auto", match_mode="tracked", threshold=0.7, pyramid_levels=3, pyramid_margin=4,
+                 search_expand_factor=1.5, verify_margin=6, min_registration_confidence=0.3,
+                 use_motion_gate=True, decode_workers=DECODE_WORKERS, match_workers=1, pyramid_cache_size=None,
+                 max_results=4, recipe_store=None, timer=None):
+        if match_mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode {match_mode!r}, expected one of {', '.join(MATCH_MODES)}")
+        self.backend_name = backend
+        self.match_mode = match_mode
+        self.match_threshold = threshold
+        self.pyramid_levels = pyramid_levels
+        self.pyramid_margin = pyramid_margin
+        self.search_expand_factor = search_expand_factor
+        self.verify_margin = verify_margin
+        self.min_registration_confidence = min_registration_confidence
+        self.use_motion_gate = use_motion_gate
+        self.match_workers = match_workers  # threads matching the ROIs of one frame, not used by "tracked"
+        self.pyramid_cache_size = pyramid_cache_size  # ROI pyramids kept in memory, None = all
+        self.timer = timer or StageTimer()  # gray, match, match_roi stage latencies
+
+        self._own_store = recipe_store is None
+        self.recipe_store = recipe_store
+        self.loader = AnnotationLoader(workers=decode_workers)
+        self.board_model = None
+        self.recipe_version = None
+        self.annotations = []
+        self.roi_cache = {}
+        self.roi_pyramid_cache = {}
+        self.registrations = {}  # golden_file -> BoardRegistration
+        self.frame_shape = None  # shape of the last matched frame
+
+        self.matching_backend = None
+        self.roi_tracker = RoiTracker(threshold)
+        self.motion_gate = MotionGate()
+        self.last_matches = None
+        self.pipeline = InspectionPipeline(self.gated_match, max_results)
+        self._pool = None
+
+        # counters
+        self.search_fallbacks = 0
+        self.registration_failures = 0
+
+    # lifecycle
+    def open(self):
+        """Create the matching backend and the ROI worker threads, safe to call again"""
+        if self.matching_backend is None:
+            backend = create_backend(self.backend_name)
+            for key, roi_img in self.roi_cache.items():
+                backend.load(key, roi_img)
+            self.matching_backend = backend
+        if self.match_workers > 1 and self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.match_workers)
+        return self
+
+    def start(self):
+        """Start the background matching worker used by submit() / latest_result()"""
+        self.open()
+        self.pipeline.start()
+
+    def stop(self):
+        self.pipeline.stop()
+
+    def close(self):
+        """Stop the worker and free templates, backend buffers and threads"""
+        self.stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if self.matching_backend is not None:
+            self.matching_backend.clear()
+            self.matching_backend = None
+        self.roi_cache = {}
+        self.roi_pyramid_cache = {}
+        self.registrations = {}
+        self.roi_tracker.set_rois([], [], [])
+        if self._own_store and self.recipe_store is not None:
+            self.recipe_store.close()
+            self.recipe_store = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # recipe
+    def load_recipe(self, board_model=None, serial="", version=None):
+        """Load a board model's recipe, or the one a serial number resolves to, returns its version or None.
+
+        Without a model or serial the current model is reloaded, and while the recipe store
+        is still empty the old annotation_logs JSON files are used.
+        """
+        if self.recipe_store is None:
+            self.recipe_store = RecipeStore()
+        if board_model is None:
+            board_model = self.recipe_store.resolve_model(serial) if serial else self.board_model
+
+        self.board_model = board_model
+        self.recipe_version = None
+        if board_model:
+            self.recipe_version = self.loader.load_recipe(self.recipe_store, board_model, version)
+        elif not self.recipe_store.has_recipes():
+            self.loader.load_annotations()
+        else:
+            self.loader.annotations = []
+            self.loader.templates = {}
+        self.load_templates(self.loader.annotations, self.loader.templates)
+        return self.recipe_version
+
+    def load_templates(self, annotations, templates):
+        """Use these annotations and grayscale templates (roi_file -> array) for matching"""
+        roi_cache = {}
+        roi_pyramid_cache = {}
+        registrations = {}
+        if self.matching_backend is not None:
+            self.matching_backend.clear()
+
+        for rect in annotations:
+            roi_file = rect.get("roi_file")
+            roi_img = templates.get(roi_file) if roi_file else None
+            if roi_img is None:
+                print(f"Warning: Could not load ROI {roi_file}")
+                continue
+
+            roi_cache[roi_file] = roi_img
+            if self.pyramid_cache_size is None or len(roi_pyramid_cache) < self.pyramid_cache_size:
+                roi_pyramid_cache[roi_file] = build_pyramid(roi_img, self.pyramid_levels)
+            if self.matching_backend is not None:
+                self.matching_backend.load(roi_file, roi_img)
+
+            # one registration per golden board frame of this recipe, kept from the last recipe when shared
+            golden_file = rect.get("golden_file")
+            if golden_file and golden_file not in registrations:
+                registration = self.registrations.get(golden_file)
+                if registration is None:
+                    golden_img = cv2.imread(golden_file, cv2.IMREAD_GRAYSCALE)
+                    if golden_img is None:
+                        print(f"Warning: Could not load golden board {golden_file}")
+                        continue
+                    registration = BoardRegistration(golden_img)
+                registrations[golden_file] = registration
+
+        # new dicts so a worker in the middle of a frame keeps a consistent view
+        self.annotations = [rect for rect in annotations if rect.get("roi_file") in roi_cache]
+        self.roi_cache = roi_cache
+        self.roi_pyramid_cache = roi_pyramid_cache
+        self.registrations = registrations
+
+        # backend buffers for the last frame size, otherwise built on the first frame
+        if self.match_mode == "full" and self.matching_backend is not None and self.frame_shape is not None:
+            self.matching_backend.prepare(self.frame_shape)
+
+        # track from the annotated positions
+        self.roi_tracker.set_rois(
+            [rect["roi_file"] for rect in self.annotations],
+            [roi_cache[rect["roi_file"]] for rect in self.annotations],
+            [(rect["x"], rect["y"]) for rect in self.annotations],
+        )
+
+        # recipe changed, the next frame has to be matched again
+        self.reset()
+        print(f"Preloaded {len(roi_cache)} ROI images into cache, {len(self.registrations)} golden boards.")
+
+    def reset(self):
+        """Forget frame-to-frame state, e.g. after the recipe or the camera changed"""
+        self.motion_gate.reset()
+        self.last_matches = None
+        self.pipeline.reset()
+
+    # frames
+    def match(self, frame):
+        """Return the (top_left, bottom_right, roi_file, score) matches of every ROI found in a BGR frame"""
+        with self.timer.stage("gray"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        self.frame_shape = gray.shape
+
+        start_time = time.perf_counter()
+        matches = self._match_gray(gray)
+        elapsed = time.perf_counter() - start_time
+        self.timer.record("match", elapsed)
+        if self.match_mode == "tracked" and self.annotations:
+            # the tracker matches all ROIs in one call, record the average per ROI
+            self.timer.record("match_roi", elapsed / len(self.annotations))
+        return matches
+
+    def _match_gray(self, gray):
+        # Tracked mode keeps per-ROI state between frames, see RoiTracker
+        if self.match_mode == "tracked":
+            return self._match_tracked(gray)
+
+        # Registered mode: estimate the golden-to-live transform once per golden board,
+        # a registration below min_registration_confidence sends its ROIs to the backend's full search.
+        # The live frame features are computed once, every registration uses the same ORB settings.
+        transforms = {}
+        if self.match_mode == "registered":
+            features = None
+            for golden_file, registration in list(self.registrations.items()):
+                if features is None:
+                    features = registration.features(gray)
+                transform, confidence = registration.estimate(gray, features)
+                if confidence >= self.min_registration_confidence:
+                    transforms[golden_file] = transform
+                else:
+                    self.registration_failures += 1
+
+        # Full mode hands the frame to the backend once, every ROI reuses it
+        if self.match_mode == "full":
+            self.open()
+            try:
+                self.matching_backend.set_frame(gray)
+            except cv2.error as e:
+                print(f"Matching backend failed to take the frame: {e}")
+                return []
+
+        # Pyramid and anchored modes build the frame pyramid at most once per frame,
+        # anchored mode only needs it when a ROI is not found near its annotated position
+        # and the backend's full search only when the pyramid misses as well
+        frame_pyramid = []
+        pyramid_lock = threading.Lock()
+
+        def get_frame_pyramid():
+            with pyramid_lock:
+                if not frame_pyramid:
+                    frame_pyramid.extend(build_pyramid(gray, self.pyramid_levels))
+            return frame_pyramid
+
+        full_search = self._backend_search(gray)
+
+        # snapshot, the recipe may be replaced while this frame is matched
+        roi_cache = self.roi_cache
+        jobs = [(rect, roi_cache[rect["roi_file"]]) for rect in self.annotations if rect["roi_file"] in roi_cache]
+
+        def match_one(job):
+            with self.timer.stage("match_roi"):
+                return self._match_roi(gray, *job, transforms, get_frame_pyramid, full_search)
+
+        results = self._pool.map(match_one, jobs) if self._pool is not None else map(match_one, jobs)
+        return [match for match in results if match is not None]
+
+    def _match_roi(self, gray, rect, roi_img, transforms, get_frame_pyramid, full_search):
+        roi_file = rect["roi_file"]
+
+        # Skip if ROI is bigger than frame
+        if roi_img.shape[0] > gray.shape[0] or roi_img.shape[1] > gray.shape[1]:
+            return None
+
+        try:
+            # Anchored mode: boards sit in a fixture, so look where the ROI was annotated first
+            match = None
+            golden_file = rect.get("golden_file")
+            if self.match_mode == "registered" and golden_file:
+                # Tiny verification match at the warped ROI position
+                transform = transforms.get(golden_file)
+                if transform is not None:
+                    x, y = warp_point(transform, rect["x"], rect["y"])
+                    match = anchored_match(gray, roi_img, x, y, 1.0, self.verify_margin)
+                if match is None or match[0] < self.match_threshold:
+                    self.search_fallbacks += 1
+                    match = None
+
+            elif self.match_mode in ("anchored", "registered"):
+                # No golden board for this ROI, search around its annotated position
+                match = anchored_match(gray, roi_img, rect["x"], rect["y"], self.search_expand_factor)
+                if match is None or match[0] < self.match_threshold:
+                    self.search_fallbacks += 1
+                    match = None
+
+            if match is None and self.match_mode == "registered":
+                # registration could not place the ROI, the full search the backends implement decides
+                match = full_search(roi_file, roi_img)
+
+            elif match is None and self.match_mode in ("pyramid", "anchored"):
+                roi_pyramid = self.roi_pyramid_cache.get(roi_file)
+                if roi_pyramid is None:
+                    roi_pyramid = build_pyramid(roi_img, self.pyramid_levels)
+                match = pyramid_match(get_frame_pyramid(), roi_pyramid, self.pyramid_margin)
+                if self.match_mode == "anchored" and (match is None or match[0] < self.match_threshold):
+                    # the ROI is known to be off its position, an approximate search is not enough
+                    match = full_search(roi_file, roi_img)
+
+            elif match is None:
+                if roi_file not in self.matching_backend.templates:
+                    self.matching_backend.load(roi_file, roi_img)
+                match = self.matching_backend.match(roi_file)
+
+        except cv2.error as e:
+            print(f"Template matching failed for {roi_file}: {e}")
+            return None
+
+        if match is None or match[0] < self.match_threshold:
+            return None
+        max_val, max_loc = match
+        h_roi, w_roi = roi_img.shape[:2]
+        top_left = (int(max_loc[0]), int(max_loc[1]))
+        bottom_right = (top_left[0] + w_roi, top_left[1] + h_roi)
+        return top_left, bottom_right, roi_file, float(max_val)
+
+    def _backend_search(self, gray):
+        """Return full_search(roi_file, roi_img), the exact search of the matching backend.
+
+        The frame is handed to the backend on the first call only, so frames where every
+        ROI is found by the cheaper searches never pay for the upload.
+        """
+        frame_set = []
+        lock = threading.Lock()
+
+        def full_search(roi_file, roi_img):
+            with lock:
+                if not frame_set:
+                    self.open()
+                    self.matching_backend.set_frame(gray)
+                    frame_set.append(True)
+            if roi_file not in self.matching_backend.templates:
+                self.matching_backend.load(roi_file, roi_img)
+            return self.matching_backend.match(roi_file)
+
+        return full_search
+
+    def _match_tracked(self, gray):
+        """Match near each ROI's last hit, lost ROIs get a pyramid search a few at a time.
+
+        A pyramid hit below the threshold is checked by the backend's full search, the
+        coarse levels can rank a low-contrast ROI below its look-alikes.
+        """
+        frame_pyramid = []
+        full_search = self._backend_search(gray)
+
+        def global_search(roi_file, roi_img):
+            # frame pyramid is built at most once per frame, only when something is lost
+            if not frame_pyramid:
+                frame_pyramid.extend(build_pyramid(gray, self.pyramid_levels))
+            roi_pyramid = self.roi_pyramid_cache.get(roi_file)
+            if roi_pyramid is None:
+                roi_pyramid = build_pyramid(roi_img, self.pyramid_levels)
+            match = pyramid_match(frame_pyramid, roi_pyramid, self.pyramid_margin)
+            if match is None or match[0] < self.match_threshold:
+                self.search_fallbacks += 1
+                match = full_search(roi_file, roi_img)
+            return match
+
+        try:
+            return self.roi_tracker.update(gray, global_search)
+        except cv2.error as e:
+            print(f"ROI tracking failed: {e}")
+            return []
+
+    def gated_match(self, frame):
+        """Match the frame only when the scene changed, otherwise return the previous matches."""
+        changed = not self.use_motion_gate or self.motion_gate.changed(frame)
+        tracked = self.match_mode == "tracked"
+        if changed and tracked:
+            self.roi_tracker.rescan()
+        # the tracker needs consecutive frames to find its lost ROIs, a still board must not starve it
+        if not changed and self.last_matches is not None and (not tracked or self.roi_tracker.settled()):
+            self.motion_gate.skipped()
+            return self.last_matches
+
+        self.last_matches = self.match(frame)
+        return self.last_matches
+
+    def inspect(self, frame):
+        """Inspect one frame, returns a result dictionary with one entry per recipe ROI"""
+        start_time = time.perf_counter()
+        matches = self.gated_match(frame)
+        elapsed = time.perf_counter() - start_time
+
+        found = {roi_file: (top_left, bottom_right, score) for top_left, bottom_right, roi_file, score in matches}
+        rois = []
+        for rect in self.annotations:
+            hit = found.get(rect["roi_file"])
+            rois.append({
+                "roi_file": rect["roi_file"],
+                "found": hit is not None,
+                "score": round(hit[2], 4) if hit else None,
+                "x": hit[0][0] if hit else None,
+                "y": hit[0][1] if hit else None,
+                "expected_x": rect["x"],
+                "expected_y": rect["y"],
+                "width": rect["width"],
+                "height": rect["height"],
+            })
+
+        return {
+            "board_model": self.board_model,
+            "recipe_version": self.recipe_version,
+            "roi_count": len(rois),
+            "found": len(found),
+            "passed": len(found) == len(rois),
+            "match_ms": round(elapsed * 1000, 2),
+            "rois": rois,
+            "matches": matches,
+        }
+
+    def submit(self, seq, frame):
+        """Queue a frame for the background worker, see InspectionPipeline"""
+        self.pipeline.submit(seq, frame)
+
+    def latest_result(self):
+        """Most recent (seq, timestamp, matches) of the background worker"""
+        return self.pipeline.latest_result()
+
+    def pyramid_report(self, frame):
+        """Score deviation and timing of pyramid matching versus full search, see pyramid_deviation"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return pyramid_deviation(gray, list(self.roi_cache.items()), self.pyramid_levels, self.pyramid_margin)
+
+    def stats(self):
+        """Return the engine, worker, motion gate and tracker counters as one dictionary"""
+        return {
+            "backend": self.matching_backend.name if self.matching_backend is not None else None,
+            "match_mode": self.match_mode,
+            "rois": len(self.roi_cache),
+            "search_fallbacks": self.search_fallbacks,
+            "registration_failures": self.registration_failures,
+            **self.pipeline.stats(),
+            **{f"gate_{key}": value for key, value in self.motion_gate.stats().items()},
+            **self.roi_tracker.stats(),
+        }
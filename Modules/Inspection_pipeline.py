@@ -0,0 +1,118 @@
+import time
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class InspectionPipeline:
+    """Run ROI matching on a worker thread and hand results back tagged with the frame sequence"""
+    def __init__(self, match_func, max_results=4):
+        self.match_func = match_func
+        self.results = queue.Queue(maxsize=max_results)
+        self.running = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._new_frame = threading.Event()
+
+        # input slot, a newer frame replaces one the worker has not started yet
+        self._pending = None
+
+        # most recent completed result (seq, timestamp, matches)
+        self.last_result = (0, 0.0, [])
+
+        # counters
+        self.frames_submitted = 0
+        self.frames_skipped = 0
+        self.frames_matched = 0
+        self.last_match_time = 0.0
+
+    def start(self):
+        """Start the matching worker"""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._match_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the matching worker"""
+        self.running = False
+        self._new_frame.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, seq, frame):
+        """Queue a frame for matching without blocking, replaces any frame still waiting"""
+        with self._lock:
+            if self._pending is not None:
+                self.frames_skipped += 1
+            self._pending = (seq, time.time(), frame)
+            self.frames_submitted += 1
+        self._new_frame.set()
+
+    def _match_loop(self):
+        """Match the newest submitted frame and push the result to the queue"""
+        while self.running:
+            self._new_frame.wait()
+            with self._lock:
+                job = self._pending
+                self._pending = None
+                self._new_frame.clear()
+            if job is None or not self.running:
+                continue
+
+            seq, submitted_at, frame = job
+            start_time = time.time()
+            try:
+                matches = self.match_func(frame)
+            except Exception as e:
+                logger.error(f"Matching failed for frame {seq}: {e}")
+                continue
+            self.last_match_time = time.time() - start_time
+            self.frames_matched += 1
+
+            # keep the queue bounded, the renderer only needs the newest result
+            result = (seq, submitted_at, matches)
+            while True:
+                try:
+                    self.results.put_nowait(result)
+                    break
+                except queue.Full:
+                    try:
+                        self.results.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def latest_result(self):
+        """Drain the result queue and return the most recent (seq, timestamp, matches)"""
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] >= self.last_result[0]:
+                self.last_result = result
+        return self.last_result
+
+    def reset(self):
+        """Forget pending frames and old results, e.g. after the capture restarts"""
+        with self._lock:
+            self._pending = None
+        while True:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+        self.last_result = (0, 0.0, [])
+
+    def stats(self):
+        """Return the pipeline counters as a dictionary"""
+        return {
+            "frames_submitted": self.frames_submitted,
+            "frames_skipped": self.frames_skipped,
+            "frames_matched": self.frames_matched,
+            "last_match_ms": round(self.last_match_time * 1000, 2),
+            "last_result_seq": self.last_result[0],
+        }
@@ -2,11 +2,26 @@
 import os
 import json
 import cv2
+from concurrent.futures import ThreadPoolExecutor
+
+from Modules.Recipe_bundle import BUNDLE_FOLDER, bundle_path, export_bundle, load_bundle
+
+MANIFEST_FILE = os.path.join("annotation_logs", "roi_images", "manifest.json")  # mtime/size of ROI files already checked
+DECODE_WORKERS = min(8, os.cpu_count() or 1)  # Threads decoding ROI images, cv2.imread releases the GIL
+
 
 class AnnotationLoader:
+    def __init__(self, manifest_file=MANIFEST_FILE, workers=DECODE_WORKERS, bundle_folder=BUNDLE_FOLDER):
+        self.manifest_file = manifest_file
+        self.workers = workers
+        self.bundle_folder = bundle_folder
+        self.annotations = []
+        self.templates = {}  # roi_file -> grayscale template, decoded once for the matchers
+
     def load_annotations(self):
-        """Load all annotations from JSON files inside annotation_logs and validate ROI files."""
+        """Load all annotations from JSON files inside annotation_logs and decode their ROI files."""
         self.annotations = []  # reset
+        self.templates = {}
 
         folder = "annotation_logs"
         roi_folder = os.path.join(folder, "roi_images")  # Subfolder for images
@@ -37,43 +52,173 @@ class AnnotationLoader:
                     continue
 
                 # Validate each annotation
+                default_golden = data.get("golden_file") if isinstance(data, dict) else None
                 for ann in raw_annotations:
-                    roi_file = ann.get("roi_file")
-                    if not roi_file:
-                        print(f"[WARNING] Annotation in {file} missing 'roi_file', skipping...")
-                        continue
-
-                    # Normalize roi_file path
-                    # If absolute, use as is; if relative, assume it's relative to roi_images
-                    if not os.path.isabs(roi_file):
-                        # Remove any leading "annotation_logs/roi_images/" or "roi_images/" to avoid duplication
-                        roi_file = roi_file.replace("annotation_logs/roi_images/", "").replace("roi_images/", "")
-                        roi_file = os.path.join(roi_folder, roi_file)
-
-                    # Ensure file ends with .png
-                    if not roi_file.lower().endswith(".png"):
-                        print(f"[WARNING] ROI file {roi_file} in {file} is not a .png file, skipping...")
-                        continue
-
-                    if not os.path.exists(roi_file):
-                        print(f"[WARNING] ROI file not found: {roi_file} (from {file})")
-                        continue
-                    if cv2.imread(roi_file) is None:
-                        print(f"[WARNING] ROI file unreadable: {roi_file} (from {file})")
-                        continue
-
-                    # Ensure annotation has required keys for display
-                    if not all(k in ann for k in ("x", "y", "width", "height")):
-                        print(f"[WARNING] Annotation in {file} missing required keys (x, y, width, height), skipping...")
-                        continue
-
-                    # Passed validation
-                    self.annotations.append(ann)
+                    ann = self.validate_annotation(ann, file, roi_folder, default_golden)
+                    if ann is not None:
+                        self.annotations.append(ann)
 
                 print(f"Loaded {file} with {len(raw_annotations)} annotations "
-                      f"({len(self.annotations)} valid so far)")
+                      f"({len(self.annotations)} candidates so far)")
 
             except Exception as e:
                 print(f"[WARNING] Failed to load {file}: {e}")
 
-        print(f"Total valid annotations loaded: {len(self.annotations)}")
\ No newline at end of file
+        self.annotations = self.decode_templates(self.annotations)
+        print(f"Total valid annotations loaded: {len(self.annotations)}")
+
+    def load_recipe(self, store, board_model, version=None, use_bundle=True):
+        """Load only the ROIs of one recipe from the recipe store, the latest version by default.
+
+        Recipe versions never change, so the first load packs them into a bundle that later
+        loads memory-map instead of decoding the ROI images.
+        """
+        self.annotations = []  # reset
+        self.templates = {}
+
+        if version is None:
+            version = store.latest_version(board_model)
+        if version is None:
+            print(f"[WARNING] No recipe found for board model {board_model}")
+            return None
+
+        source = f"recipe {board_model} v{version}"
+        bundle_file = bundle_path(board_model, version, self.bundle_folder)
+        identity = store.recipe_identity(board_model, version)
+        if use_bundle and os.path.exists(bundle_file) and self.load_bundle(bundle_file, identity):
+            print(f"Loaded {source} from {bundle_file} with {len(self.annotations)} annotations")
+            return version
+
+        roi_folder = os.path.join("annotation_logs", "roi_images")
+        raw_annotations, version = store.load_recipe(board_model, version)
+        candidates = []
+        for ann in raw_annotations:
+            ann = self.validate_annotation(ann, source, roi_folder)
+            if ann is not None:
+                candidates.append(ann)
+        self.annotations = self.decode_templates(candidates)
+
+        print(f"Loaded {source} with {len(self.annotations)}/{len(raw_annotations)} valid annotations")
+
+        if use_bundle and self.annotations:
+            try:
+                export_bundle(bundle_file, self.annotations, self.templates, board_model, version, identity)
+            except OSError as e:
+                print(f"[WARNING] Could not write recipe bundle {bundle_file}: {e}")
+        return version
+
+    def load_bundle(self, bundle_file, identity=None):
+        """Memory-map the annotations and templates of a recipe bundle, returns False if it cannot be used.
+
+        With identity given, a bundle of another recipe that got the same model and
+        version (e.g. after the recipe database was recreated) is rejected.
+        """
+        try:
+            header, templates = load_bundle(bundle_file)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Failed to load recipe bundle {bundle_file}: {e}")
+            return False
+        if identity is not None and header.get("identity") != identity:
+            print(f"Recipe bundle {bundle_file} is stale, re-exporting")
+            return False
+
+        self.templates = templates
+        self.annotations = [ann for ann in header["annotations"] if ann.get("roi_file") in templates]
+        for ann in self.annotations:
+            if ann.get("golden_file") and not os.path.exists(ann["golden_file"]):
+                print(f"[WARNING] Golden file not found: {ann['golden_file']} (from {bundle_file})")
+                ann["golden_file"] = None
+        return True
+
+    def validate_annotation(self, ann, source, roi_folder, default_golden=None):
+        """Return the annotation with normalized paths, or None if it cannot be used."""
+        roi_file = ann.get("roi_file")
+        if not roi_file:
+            print(f"[WARNING] Annotation in {source} missing 'roi_file', skipping...")
+            return None
+
+        # Normalize roi_file path
+        # If absolute, use as is; if relative, assume it's relative to roi_images
+        if not os.path.isabs(roi_file):
+            # Remove any leading "annotation_logs/roi_images/" or "roi_images/" to avoid duplication
+            roi_file = roi_file.replace("annotation_logs/roi_images/", "").replace("roi_images/", "")
+            roi_file = os.path.join(roi_folder, roi_file)
+
+        # Ensure file ends with .png
+        if not roi_file.lower().endswith(".png"):
+            print(f"[WARNING] ROI file {roi_file} in {source} is not a .png file, skipping...")
+            return None
+
+        if not os.path.exists(roi_file):
+            print(f"[WARNING] ROI file not found: {roi_file} (from {source})")
+            return None
+        ann["roi_file"] = roi_file
+
+        # Ensure annotation has required keys for display
+        if not all(k in ann for k in ("x", "y", "width", "height")):
+            print(f"[WARNING] Annotation in {source} missing required keys (x, y, width, height), skipping...")
+            return None
+
+        # Golden board frame saved with this annotation set, used for registration
+        golden_file = ann.get("golden_file") or default_golden
+        if golden_file and not os.path.exists(golden_file):
+            print(f"[WARNING] Golden file not found: {golden_file} (from {source})")
+            golden_file = None
+        ann["golden_file"] = golden_file
+
+        # Passed validation
+        return ann
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        try:
+            folder = os.path.dirname(self.manifest_file)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            tmp_file = self.manifest_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_file, self.manifest_file)
+        except OSError as e:
+            print(f"[WARNING] Could not save ROI manifest: {e}")
+
+    def decode_templates(self, annotations):
+        """Decode every ROI file once as grayscale across a thread pool, returns the usable annotations.
+
+        Files the manifest already knows as unreadable, with the same mtime and size,
+        are dropped without being decoded again.
+        """
+        manifest = self._load_manifest()
+        stamps = {}
+        to_decode = []
+        for roi_file in dict.fromkeys(ann["roi_file"] for ann in annotations):
+            try:
+                st = os.stat(roi_file)
+            except OSError:
+                continue
+            stamps[roi_file] = [st.st_mtime_ns, st.st_size]
+            known = manifest.get(roi_file)
+            if known and known["stamp"] == stamps[roi_file] and not known["valid"]:
+                print(f"[WARNING] ROI file unreadable: {roi_file} (unchanged since last check)")
+                continue
+            to_decode.append(roi_file)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            decoded = dict(zip(to_decode, pool.map(lambda f: cv2.imread(f, cv2.IMREAD_GRAYSCALE), to_decode)))
+
+        for roi_file, roi_img in decoded.items():
+            if roi_img is None:
+                print(f"[WARNING] ROI file unreadable: {roi_file}")
+                manifest[roi_file] = {"stamp": stamps[roi_file], "valid": False}
+            else:
+                self.templates[roi_file] = roi_img
+                manifest[roi_file] = {"stamp": stamps[roi_file], "valid": True, "shape": list(roi_img.shape)}
+        self._save_manifest(manifest)
+
+        return [ann for ann in annotations if ann["roi_file"] in self.templates]
@@ -0,0 +1,219 @@
+import logging
+import cv2
+
+from Modules.Fft_matcher import FftMatcher
+
+logger = logging.getLogger(__name__)
+
+MATCH_METHOD = cv2.TM_CCOEFF_NORMED
+
+
+class MatchingBackend:
+    """Full-frame TM_CCOEFF_NORMED search for a set of cached grayscale templates.
+
+    Usage per frame: set_frame(gray), then match(key) for single ROIs or
+    match_all(threshold) for (top_left, bottom_right, roi_file, score) results.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.templates = {}  # key -> grayscale template
+
+    def load(self, key, roi_img):
+        """Cache a grayscale template under key"""
+        self.templates[key] = roi_img
+
+    def unload(self, key):
+        self.templates.pop(key, None)
+
+    def clear(self):
+        self.templates = {}
+
+    def prepare(self, frame_shape):
+        """Optional warm-up for frames of this shape, e.g. buffers or spectra"""
+        pass
+
+    def set_frame(self, gray):
+        raise NotImplementedError
+
+    def match(self, key):
+        """Best (max_val, max_loc) of one template on the current frame, None if it does not fit"""
+        raise NotImplementedError
+
+    def match_all(self, threshold, keys=None):
+        """Match every template (or the given keys), returns matches scoring at least threshold"""
+        matches = []
+        for key in (list(self.templates) if keys is None else keys):
+            if key not in self.templates:
+                continue
+            try:
+                match = self.match(key)
+            except cv2.error as e:
+                logger.error(f"Template matching failed for {key}: {e}")
+                continue
+            if match is None:
+                continue
+
+            max_val, max_loc = match
+            if max_val >= threshold:
+                h_roi, w_roi = self.templates[key].shape[:2]
+                top_left = (max_loc[0], max_loc[1])
+                bottom_right = (top_left[0] + w_roi, top_left[1] + h_roi)
+                matches.append((top_left, bottom_right, key, max_val))
+        return matches
+
+
+class OpenCVBackend(MatchingBackend):
+    """cv2.matchTemplate on CPU with one reused result buffer per template"""
+    name = "opencv"
+
+    def __init__(self):
+        super().__init__()
+        self.gray = None
+        self.result_buffers = {}  # key -> float32 result of the last frame size
+
+    def unload(self, key):
+        super().unload(key)
+        self.result_buffers.pop(key, None)
+
+    def clear(self):
+        super().clear()
+        self.result_buffers = {}
+
+    def set_frame(self, gray):
+        self.gray = gray
+
+    def match(self, key):
+        roi_img = self.templates[key]
+        h, w = roi_img.shape[:2]
+        frame_h, frame_w = self.gray.shape[:2]
+        if h > frame_h or w > frame_w:
+            return None
+
+        result_shape = (frame_h - h + 1, frame_w - w + 1)
+        result = self.result_buffers.get(key)
+        if result is None or result.shape != result_shape:
+            result = cv2.matchTemplate(self.gray, roi_img, MATCH_METHOD)
+            self.result_buffers[key] = result
+        else:
+            cv2.matchTemplate(self.gray, roi_img, MATCH_METHOD, result=result)
+
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+
+class FftBackend(MatchingBackend):
+    """Shared-spectrum FFT matching on CPU, see FftMatcher"""
+    name = "fft"
+
+    def __init__(self):
+        super().__init__()
+        self.matcher = FftMatcher()
+
+    def load(self, key, roi_img):
+        super().load(key, roi_img)
+        self.matcher.add_template(key, roi_img)
+
+    def unload(self, key):
+        super().unload(key)
+        self.matcher.remove_template(key)
+
+    def clear(self):
+        super().clear()
+        self.matcher.clear()
+
+    def prepare(self, frame_shape):
+        self.matcher.prepare(frame_shape)
+
+    def set_frame(self, gray):
+        self.matcher.set_frame(gray)
+
+    def match(self, key):
+        return self.matcher.match(key)
+
+
+class CudaBackend(MatchingBackend):
+    """cv2.cuda template matching with templates, frame and results kept on the GPU"""
+    name = "cuda"
+
+    def __init__(self):
+        super().__init__()
+        self.frame_shape = None
+        self.gpu_frame = cv2.cuda.GpuMat()
+        self.gpu_templates = {}
+        self.gpu_results = {}
+        self.host_results = {}  # key -> downloaded result, reused between frames
+        self.matchers = {}
+
+    def load(self, key, roi_img):
+        super().load(key, roi_img)
+        gpu_roi = cv2.cuda.GpuMat()
+        gpu_roi.upload(roi_img)
+        self.gpu_templates[key] = gpu_roi
+        if key not in self.matchers:
+            self.matchers[key] = cv2.cuda.createTemplateMatching(cv2.CV_8U, MATCH_METHOD)
+
+    def unload(self, key):
+        super().unload(key)
+        self.gpu_templates.pop(key, None)
+        self.gpu_results.pop(key, None)
+        self.host_results.pop(key, None)
+        self.matchers.pop(key, None)
+
+    def clear(self):
+        super().clear()
+        self.gpu_templates = {}
+        self.gpu_results = {}
+        self.host_results = {}
+        self.matchers = {}
+
+    def set_frame(self, gray):
+        # upload() reuses the GPU allocation while the frame size does not change
+        self.frame_shape = gray.shape[:2]
+        self.gpu_frame.upload(gray)
+
+    def match(self, key):
+        h, w = self.templates[key].shape[:2]
+        if h > self.frame_shape[0] or w > self.frame_shape[1]:
+            return None
+
+        gpu_result = self.gpu_results.get(key)
+        if gpu_result is None:
+            gpu_result = cv2.cuda.GpuMat()
+            self.gpu_results[key] = gpu_result
+        self.matchers[key].match(self.gpu_frame, self.gpu_templates[key], gpu_result)
+
+        result = self.host_results.get(key)
+        if result is None or result.shape != (gpu_result.rows, gpu_result.cols):
+            result = gpu_result.download()
+            self.host_results[key] = result
+        else:
+            gpu_result.download(result)
+
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+
+BACKENDS = {
+    OpenCVBackend.name: OpenCVBackend,
+    FftBackend.name: FftBackend,
+    CudaBackend.name: CudaBackend,
+}
+
+
+def cuda_available():
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+def create_backend(name="auto"):
+    """Create a matching backend by name, "auto" picks cuda when available and opencv otherwise"""
+    if name == "auto":
+        name = CudaBackend.name if cuda_available() else OpenCVBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown matching backend '{name}', expected one of: auto, {', '.join(BACKENDS)}")
+    if name == CudaBackend.name and not cuda_available():
+        raise RuntimeError("CUDA matching backend requested but no CUDA device is available")
+    return BACKENDS[name]()
@@ -0,0 +1,87 @@
+import cv2
+
+# Motion gate parameters
+GATE_SIZE = (160, 90)  # Frames are compared at this size
+PIXEL_THRESHOLD = 12  # Gray level change for a pixel to count as changed
+CHANGED_RATIO = 0.01  # Fraction of changed pixels that counts as motion
+BRIGHTNESS_THRESHOLD = 6.0  # Mean gray level change that counts as a lighting change
+MAX_SKIPPED = 150  # Force a re-match after this many skipped frames, 0 = never
+
+
+class MotionGate:
+    """Decide whether a frame differs enough from the last matched frame to be matched again.
+
+    Frames are compared downscaled against the frame that was last let through,
+    so slow drift still adds up and eventually opens the gate.
+    """
+    def __init__(self, size=GATE_SIZE, pixel_threshold=PIXEL_THRESHOLD, changed_ratio=CHANGED_RATIO,
+                 brightness_threshold=BRIGHTNESS_THRESHOLD, max_skipped=MAX_SKIPPED):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.changed_ratio = changed_ratio
+        self.brightness_threshold = brightness_threshold
+        self.max_skipped = max_skipped
+        self.reference = None
+        self.reference_mean = 0.0
+        self.skipped_in_row = 0
+
+        # counters
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.motion_events = 0
+        self.lighting_events = 0
+
+    def _small_gray(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def changed(self, frame):
+        """Return True when the frame should be matched, False when the last results still hold.
+
+        Call skipped() when the last results are then really reused, only those frames count as skipped.
+        """
+        self.frames_checked += 1
+        small = self._small_gray(frame)
+
+        changed = self.reference is None or self.reference.shape != small.shape
+        if not changed:
+            mean = cv2.mean(small)[0]
+            if abs(mean - self.reference_mean) > self.brightness_threshold:
+                self.lighting_events += 1
+                changed = True
+            else:
+                diff = cv2.absdiff(small, self.reference)
+                _, diff = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+                if cv2.countNonZero(diff) >= self.changed_ratio * diff.size:
+                    self.motion_events += 1
+                    changed = True
+
+        if not changed and self.max_skipped and self.skipped_in_row >= self.max_skipped:
+            changed = True
+
+        if changed:
+            self.reference = small
+            self.reference_mean = cv2.mean(small)[0]
+            self.skipped_in_row = 0
+        return changed
+
+    def skipped(self):
+        """The frame was not matched, the last results were reused"""
+        self.frames_skipped += 1
+        self.skipped_in_row += 1
+
+    def reset(self):
+        """Force the next frame through, e.g. after the recipe changed"""
+        self.reference = None
+        self.skipped_in_row = 0
+
+    def stats(self):
+        """Return the gate counters as a dictionary"""
+        return {
+            "frames_checked": self.frames_checked,
+            "frames_skipped": self.frames_skipped,
+            "motion_events": self.motion_events,
+            "lighting_events": self.lighting_events,
+        }
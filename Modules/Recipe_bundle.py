@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+
+BUNDLE_FOLDER = os.path.join("annotation_logs", "bundles")
+BUNDLE_MAGIC = b"SHRPRCP1"
+ALIGNMENT = 64  # Templates start on 64 byte boundaries inside the data block
+
+# Layout: magic (8 bytes) | header length (uint64 LE) | JSON header | padding | template data
+# The header holds the board model, version, recipe identity, annotations and offset tables
+# {"key", "offset", "height", "width"} into the data block, one row per template and golden board.
+
+
+def bundle_path(board_model, version, folder=BUNDLE_FOLDER):
+    """Bundle file of one recipe version"""
+    safe_model = "".join(c if c.isalnum() or c in "-_." else "_" for c in board_model)
+    return os.path.join(folder, f"{safe_model}_v{version}.bundle")
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_bundle(path, annotations, templates, board_model=None, version=None, identity=None, goldens=None):
+    """Pack the grayscale templates of a recipe and its annotations into one file.
+
+    templates maps roi_file -> 2D uint8 array, annotations without a template are left out.
+    identity is the recipe's RecipeStore.recipe_identity, a cached bundle is only used
+    while it still matches the store. goldens maps golden_file -> 2D uint8 golden board,
+    packed so a bundle moved to another host can still register boards.
+    """
+    goldens = goldens or {}
+    offset = 0
+    tables = {}
+    for name, images in (("templates", templates), ("goldens", goldens)):
+        tables[name] = []
+        for key, img in images.items():
+            tables[name].append({"key": key, "offset": offset, "height": int(img.shape[0]), "width": int(img.shape[1])})
+            offset = _aligned(offset + img.size)
+
+    header = json.dumps({
+        "board_model": board_model,
+        "version": version,
+        "identity": identity,
+        "annotations": [ann for ann in annotations if ann.get("roi_file") in templates],
+        "templates": tables["templates"],
+        "goldens": tables["goldens"],
+        "data_size": offset,
+    }).encode("utf-8")
+    data_start = _aligned(len(BUNDLE_MAGIC) + 8 + len(header))
+
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # several processes may export the same recipe
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, images in (("templates", templates), ("goldens", goldens)):
+            for row in tables[name]:
+                f.seek(data_start + row["offset"])
+                f.write(np.ascontiguousarray(images[row["key"]], np.uint8).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)  # readers never see a half written bundle
+    return path
+
+
+def read_header(path):
+    """Return (header dict, data block start) of a bundle file"""
+    with open(path, "rb") as f:
+        if f.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a recipe bundle")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return header, _aligned(len(BUNDLE_MAGIC) + 8 + header_len)
+
+
+def _map_images(path, header, data_start, table):
+    if not header["data_size"]:
+        return {}
+    data = np.memmap(path, np.uint8, "r", offset=data_start, shape=(header["data_size"],))
+    images = {}
+    for row in header.get(table, []):
+        size = row["height"] * row["width"]
+        view = data[row["offset"]:row["offset"] + size].reshape(row["height"], row["width"])
+        images[row["key"]] = np.asarray(view)
+    return images
+
+
+def load_bundle(path):
+    """Memory-map a bundle, returns (header, {roi_file: read-only template view}).
+
+    The views point into the page cache, so nothing is decoded or copied and several
+    processes loading the same bundle share the memory.
+    """
+    header, data_start = read_header(path)
+    return header, _map_images(path, header, data_start, "templates")
+
+
+def load_goldens(path):
+    """Memory-map the golden boards packed into a bundle, returns {golden_file: read-only view}"""
+    header, data_start = read_header(path)
+    return _map_images(path, header, data_start, "goldens")
+
+
+def read_goldens(annotations):
+    """Grayscale golden boards referenced by annotations, {golden_file: array}, for export_bundle"""
+    import cv2
+
+    goldens = {}
+    for ann in annotations:
+        golden_file = ann.get("golden_file")
+        if golden_file and golden_file not in goldens:
+            golden_img = cv2.imread(golden_file, cv2.IMREAD_GRAYSCALE)
+            if golden_img is not None:
+                goldens[golden_file] = golden_img
+    return goldens
+
+
+def _write_unique(folder, filename, img):
+    """Write img as folder/filename, or under a numbered name when a different image already has that name.
+
+    ROI file names are timestamps, so recipes from other hosts can reuse them. Returns the path used.
+    """
+    import cv2
+
+    stem, ext = os.path.splitext(filename)
+    path = os.path.join(folder, filename)
+    number = 1
+    while os.path.exists(path):
+        existing = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if existing is not None and np.array_equal(existing, img):
+            return path  # the same image is already there
+        path = os.path.join(folder, f"{stem}_{number}{ext}")
+        number += 1
+    cv2.imwrite(path, img)
+    return path
+
+
+def import_bundle(path, store, roi_folder=os.path.join("annotation_logs", "roi_images"),
+                  golden_folder=os.path.join("annotation_logs", "golden_images")):
+    """Unpack a bundle into ROI and golden board images and save it as a new recipe version, returns (board_model, version)"""
+    header, templates = load_bundle(path)
+    goldens = load_goldens(path)
+    board_model = header.get("board_model")
+    os.makedirs(roi_folder, exist_ok=True)
+
+    golden_files = {}
+    for golden_file, golden_img in goldens.items():
+        os.makedirs(golden_folder, exist_ok=True)
+        golden_files[golden_file] = _write_unique(golden_folder, os.path.basename(golden_file), golden_img)
+
+    annotations = []
+    for ann in header["annotations"]:
+        roi_img = templates.get(ann["roi_file"])
+        if roi_img is None:
+            continue
+        ann = dict(ann)
+        ann["roi_file"] = _write_unique(roi_folder, os.path.basename(ann["roi_file"]), roi_img)
+        golden_file = ann.get("golden_file")
+        if golden_file in golden_files:
+            ann["golden_file"] = golden_files[golden_file]
+        elif golden_file and not os.path.exists(golden_file):
+            ann["golden_file"] = None
+        annotations.append(ann)
+
+    version = store.save_recipe(board_model, annotations)
+    return board_model, version
+
+
+if __name__ == "__main__":
+    from Modules.Recipe_store import RecipeStore
+    from Modules.Load_annotations import AnnotationLoader
+
+    parser = argparse.ArgumentParser(description="Export or import packed recipe bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="Pack a recipe from the recipe store")
+    export_cmd.add_argument("board_model")
+    export_cmd.add_argument("--version", type=int, default=None, help="Default: latest")
+    export_cmd.add_argument("--output", help="Default: the bundle cache in annotation_logs/bundles")
+    import_cmd = commands.add_parser("import", help="Add a bundle to the recipe store as a new version")
+    import_cmd.add_argument("bundle")
+    args = parser.parse_args()
+
+    store = RecipeStore()
+    if args.command == "export":
+        loader = AnnotationLoader()
+        version = loader.load_recipe(store, args.board_model, args.version, use_bundle=False)
+        if version is None:
+            sys.exit(1)
+        output = args.output or bundle_path(args.board_model, version)
+        goldens = read_goldens(loader.annotations)
+        export_bundle(output, loader.annotations, loader.templates, args.board_model, version,
+                      store.recipe_identity(args.board_model, version), goldens)
+        print(f"Exported {len(loader.templates)} templates and {len(goldens)} golden boards to {output}")
+    else:
+        board_model, version = import_bundle(args.bundle, store)
+        print(f"Imported {args.bundle} as recipe {board_model} v{version}")
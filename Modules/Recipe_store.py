@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+DEFAULT_DB_PATH = os.path.join("annotation_logs", "recipes.db")
+DEFAULT_MODEL = "default"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    board_model TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    golden_file TEXT,
+    saved_at TEXT NOT NULL,
+    UNIQUE (board_model, version)
+);
+CREATE TABLE IF NOT EXISTS rois (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+    roi_file TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS serial_prefixes (
+    prefix TEXT PRIMARY KEY,
+    board_model TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_model_version ON recipes (board_model, version);
+CREATE INDEX IF NOT EXISTS idx_rois_recipe ON rois (recipe_id);
+"""
+
+
+class RecipeStore:
+    """SQLite store of annotation recipes, versioned per board model"""
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def save_recipe(self, board_model, annotations, golden_file=None):
+        """Save annotations as the next version of board_model's recipe, returns the new version"""
+        board_model = board_model or DEFAULT_MODEL
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM recipes WHERE board_model = ?", (board_model,)
+            ).fetchone()
+            version = row[0] + 1
+            cursor = self.conn.execute(
+                "INSERT INTO recipes (board_model, version, golden_file, saved_at) VALUES (?, ?, ?, ?)",
+                (board_model, version, golden_file, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+            recipe_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO rois (recipe_id, roi_file, x, y, width, height, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (recipe_id, ann["roi_file"], int(ann["x"]), int(ann["y"]), int(ann["width"]),
+                     int(ann["height"]), json.dumps(ann))
+                    for ann in annotations
+                ],
+            )
+        return version
+
+    def load_recipe(self, board_model, version=None):
+        """Return (annotations, version) of a recipe, the latest version by default.
+
+        annotations is empty and version is None if the recipe does not exist.
+        """
+        with self._lock:
+            if version is None:
+                row = self.conn.execute(
+                    "SELECT id, version, golden_file FROM recipes WHERE board_model = ? "
+                    "ORDER BY version DESC LIMIT 1", (board_model,)
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT id, version, golden_file FROM recipes WHERE board_model = ? AND version = ?",
+                    (board_model, version),
+                ).fetchone()
+            if row is None:
+                return [], None
+
+            recipe_id, version, golden_file = row
+            rows = self.conn.execute(
+                "SELECT data FROM rois WHERE recipe_id = ? ORDER BY id", (recipe_id,)
+            ).fetchall()
+
+        annotations = []
+        for (data,) in rows:
+            ann = json.loads(data)
+            if golden_file and not ann.get("golden_file"):
+                ann["golden_file"] = golden_file
+            annotations.append(ann)
+        return annotations, version
+
+    def recipe_identity(self, board_model, version):
+        """{"recipe_id", "saved_at"} of one recipe version, or None.
+
+        Version numbers start over when the database is recreated, this tells the
+        recipes apart, e.g. for cached bundles.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, saved_at FROM recipes WHERE board_model = ? AND version = ?", (board_model, version)
+            ).fetchone()
+        return {"recipe_id": row[0], "saved_at": row[1]} if row else None
+
+    def latest_version(self, board_model):
+        """Latest version of a board model's recipe, or None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(version) FROM recipes WHERE board_model = ?", (board_model,)
+            ).fetchone()
+        return row[0]
+
+    def list_models(self):
+        """Return {board_model: latest version}"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT board_model, MAX(version) FROM recipes GROUP BY board_model ORDER BY board_model"
+            ).fetchall()
+        return dict(rows)
+
+    def has_recipes(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM recipes LIMIT 1").fetchone() is not None
+
+    def add_serial_prefix(self, prefix, board_model):
+        """Map serial numbers starting with prefix to a board model"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO serial_prefixes (prefix, board_model) VALUES (?, ?)", (prefix, board_model)
+            )
+
+    def remove_serial_prefix(self, prefix):
+        """Forget a serial prefix, returns False if it was not registered"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM serial_prefixes WHERE prefix = ?", (prefix,))
+        return cursor.rowcount > 0
+
+    def list_serial_prefixes(self):
+        """Return {prefix: board_model}"""
+        with self._lock:
+            rows = self.conn.execute("SELECT prefix, board_model FROM serial_prefixes ORDER BY prefix").fetchall()
+        return dict(rows)
+
+    def resolve_model(self, serial):
+        """Board model for a scanned serial number, or None.
+
+        Tries an exact model name, then the longest registered serial prefix, then
+        the longest model name the serial starts with.
+        """
+        serial = (serial or "").strip()
+        if not serial:
+            return None
+
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM recipes WHERE board_model = ? LIMIT 1", (serial,)).fetchone():
+                return serial
+
+            row = self.conn.execute(
+                "SELECT board_model FROM serial_prefixes WHERE substr(?, 1, LENGTH(prefix)) = prefix "
+                "ORDER BY LENGTH(prefix) DESC LIMIT 1", (serial,)
+            ).fetchone()
+            if row:
+                return row[0]
+
+            row = self.conn.execute(
+                "SELECT board_model FROM recipes WHERE substr(?, 1, LENGTH(board_model)) = board_model "
+                "ORDER BY LENGTH(board_model) DESC LIMIT 1", (serial,)
+            ).fetchone()
+        return row[0] if row else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the recipe store and map serial prefixes to board models")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("models", help="List board models and their latest recipe version")
+    commands.add_parser("prefixes", help="List registered serial prefixes")
+    add_cmd = commands.add_parser("add-prefix", help="Serial numbers starting with PREFIX use MODEL's recipe")
+    add_cmd.add_argument("prefix")
+    add_cmd.add_argument("board_model")
+    remove_cmd = commands.add_parser("remove-prefix", help="Forget a serial prefix")
+    remove_cmd.add_argument("prefix")
+    resolve_cmd = commands.add_parser("resolve", help="Show the board model a serial number resolves to")
+    resolve_cmd.add_argument("serial")
+    args = parser.parse_args()
+
+    store = RecipeStore(args.db)
+    if args.command == "models":
+        for board_model, version in store.list_models().items():
+            print(f"{board_model}\tv{version}")
+    elif args.command == "prefixes":
+        for prefix, board_model in store.list_serial_prefixes().items():
+            print(f"{prefix}\t{board_model}")
+    elif args.command == "add-prefix":
+        if store.latest_version(args.board_model) is None:
+            print(f"[WARNING] No recipe saved for board model {args.board_model} yet")
+        store.add_serial_prefix(args.prefix, args.board_model)
+        print(f"Serial numbers starting with {args.prefix} use {args.board_model}")
+    elif args.command == "remove-prefix":
+        if not store.remove_serial_prefix(args.prefix):
+            print(f"Serial prefix {args.prefix} is not registered")
+            sys.exit(1)
+    else:
+        board_model = store.resolve_model(args.serial)
+        print(board_model or "no recipe")
+        sys.exit(0 if board_model else 1)
+    store.close()
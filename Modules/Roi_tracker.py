@@ -0,0 +1,120 @@
+import threading
+import numpy as np
+
+from Modules.Template_matching import anchored_match
+
+# Tracker parameters
+EMA_ALPHA = 0.5  # Smoothing factor for the drawn boxes (0-1)
+TRACK_EXPAND_FACTOR = 1.2  # Search window around the last hit, relative to the ROI size
+TRACK_MIN_MARGIN = 6  # Minimum pixels searched on each side of the last hit
+LOST_AFTER = 3  # Consecutive local misses before a ROI needs a global search
+MAX_GLOBAL_PER_FRAME = 4  # Global searches allowed per frame, lost ROIs take turns
+
+
+class RoiTracker:
+    """Track every ROI between frames, searching near its last hit and globally only when lost.
+
+    State is kept in NumPy arrays indexed like self.keys: last hit position,
+    smoothed box, confidence and consecutive miss counter.
+    """
+    def __init__(self, threshold=0.7, ema_alpha=EMA_ALPHA, expand_factor=TRACK_EXPAND_FACTOR,
+                 min_margin=TRACK_MIN_MARGIN, lost_after=LOST_AFTER, max_global_per_frame=MAX_GLOBAL_PER_FRAME):
+        self.threshold = threshold
+        self.ema_alpha = ema_alpha
+        self.expand_factor = expand_factor
+        self.min_margin = min_margin
+        self.lost_after = lost_after
+        self.max_global_per_frame = max_global_per_frame
+        self._lock = threading.Lock()
+        self.set_rois([], [], [])
+
+        # counters
+        self.local_searches = 0
+        self.global_searches = 0
+
+    def set_rois(self, keys, templates, anchors):
+        """Start tracking templates from their annotated top-left anchors (x, y)"""
+        count = len(keys)
+        with self._lock:
+            self.keys = list(keys)
+            self.templates = list(templates)
+            self.sizes = np.array([t.shape[1::-1] for t in templates], np.int32).reshape(count, 2)  # w, h
+            self.positions = np.array(anchors, np.int32).reshape(count, 2)  # last hit x, y
+            self.boxes = np.zeros((count, 4), np.float32)  # smoothed x, y, w, h
+            self.boxes[:, :2] = self.positions
+            self.boxes[:, 2:] = self.sizes
+            self.confidence = np.zeros(count, np.float32)
+            self.lost = np.zeros(count, np.int32)  # consecutive local misses
+            self._next_global = 0
+
+    def _hit(self, i, score, loc):
+        self.positions[i] = loc
+        if self.confidence[i] == 0:
+            # first hit or re-acquired, do not smooth from the old place
+            self.boxes[i, :2] = loc
+        else:
+            self.boxes[i, :2] = self.ema_alpha * np.asarray(loc, np.float32) + (1 - self.ema_alpha) * self.boxes[i, :2]
+        self.confidence[i] = score
+        self.lost[i] = 0
+
+    def _miss(self, i):
+        self.confidence[i] = 0.0
+        self.lost[i] += 1
+
+    def update(self, gray, global_search):
+        """Track all ROIs on a grayscale frame.
+
+        global_search(key, template) returns (max_val, max_loc) or None and is only called
+        for lost ROIs, at most max_global_per_frame times. Returns the ROIs found in this
+        frame as (top_left, bottom_right, key, score) using the smoothed boxes.
+        """
+        with self._lock:
+            # local search near the last hit for every ROI that is not lost
+            for i in np.flatnonzero(self.lost < self.lost_after):
+                x, y = self.positions[i]
+                self.local_searches += 1
+                match = anchored_match(gray, self.templates[i], x, y, self.expand_factor, self.min_margin)
+                if match is not None and match[0] >= self.threshold:
+                    self._hit(i, *match)
+                else:
+                    self._miss(i)
+
+            # global search for a limited number of lost ROIs, round robin so every ROI gets a turn
+            lost = np.flatnonzero(self.lost >= self.lost_after)
+            if len(lost) and self.max_global_per_frame:
+                start = np.searchsorted(lost, self._next_global)
+                turn = np.roll(lost, -start)[:self.max_global_per_frame]
+                for i in turn:
+                    self.global_searches += 1
+                    match = global_search(self.keys[i], self.templates[i])
+                    if match is not None and match[0] >= self.threshold:
+                        self._hit(i, *match)
+                    else:
+                        self.lost[i] += 1
+                self._next_global = int(turn[-1]) + 1
+
+            matches = []
+            for i in np.flatnonzero(self.lost == 0):
+                x, y = np.rint(self.boxes[i, :2]).astype(int)
+                w, h = self.sizes[i]
+                matches.append(((int(x), int(y)), (int(x + w), int(y + h)), self.keys[i], float(self.confidence[i])))
+            return matches
+
+    def settled(self):
+        """True when no ROI is still counting local misses or waiting for its global search turn"""
+        with self._lock:
+            return not np.any((self.lost > 0) & (self.lost <= self.lost_after))
+
+    def rescan(self):
+        """The scene changed, every lost ROI gets another global search"""
+        with self._lock:
+            self.lost[self.lost > self.lost_after] = self.lost_after
+
+    def stats(self):
+        """Return the tracker counters as a dictionary"""
+        return {
+            "tracked": int(np.count_nonzero(self.lost == 0)),
+            "lost": int(np.count_nonzero(self.lost >= self.lost_after)),
+            "local_searches": self.local_searches,
+            "global_searches": self.global_searches,
+        }
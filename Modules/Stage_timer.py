@@ -0,0 +1,67 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+WINDOW = 300  # Samples kept per stage, about 10 s of live view
+
+
+class StageTimer:
+    """Rolling per-stage latencies of the live loop, safe to record from any thread.
+
+    Each stage keeps its last `window` samples, percentiles are computed on demand.
+    """
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.enabled = True
+        self._samples = {}
+        self._order = []  # stages in first-seen order, which follows the live loop
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of a with-block as one sample of stage name"""
+        if not self.enabled:
+            yield
+            return
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start_time)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._order.append(name)
+            samples.append(seconds)
+
+    def summary(self):
+        """Return {stage: {"count", "p50_ms", "p95_ms", "p99_ms"}} over the rolling window"""
+        with self._lock:
+            snapshot = [(name, np.array(self._samples[name])) for name in self._order]
+        summary = {}
+        for name, samples in snapshot:
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples * 1000, [50, 95, 99])
+            summary[name] = {"count": len(samples), "p50_ms": round(float(p50), 3),
+                             "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+        return summary
+
+    def report(self):
+        """One line per stage, for the overlay and the exit dump"""
+        lines = [f"{'stage':<12}{'p50':>9}{'p95':>9}{'p99':>9}  ms"]
+        for name, row in self.summary().items():
+            lines.append(f"{name:<12}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._order = []
@@ -0,0 +1,155 @@
+import time
+import cv2
+
+# Pyramid matching parameters
+PYRAMID_LEVELS = 3  # Level 0 is full resolution, each level halves the size
+PYRAMID_REFINE_MARGIN = 4  # Search +/- pixels around the upscaled hit at each finer level
+PYRAMID_CANDIDATES = 5  # Coarse peaks refined down to full resolution, repeated labels look alike when small
+MIN_PYRAMID_SIZE = 24  # Templates smaller than this at a level are not matched there
+MATCH_METHOD = cv2.TM_CCOEFF_NORMED
+
+# Anchored matching parameters
+SEARCH_EXPAND_FACTOR = 1.5  # Search window size relative to the annotated ROI
+MIN_SEARCH_MARGIN = 8  # Minimum pixels searched on each side of the annotated ROI
+
+
+def build_pyramid(img, levels=PYRAMID_LEVELS):
+    """Return [full, half, quarter, ...] images, at most `levels` entries"""
+    pyramid = [img]
+    for _ in range(1, levels):
+        prev = pyramid[-1]
+        if min(prev.shape[:2]) < 2:
+            break
+        pyramid.append(cv2.pyrDown(prev))
+    return pyramid
+
+
+def full_match(gray, roi_img, method=MATCH_METHOD):
+    """Match a template over the whole frame, returns (max_val, max_loc) or None if it does not fit"""
+    if roi_img.shape[0] > gray.shape[0] or roi_img.shape[1] > gray.shape[1]:
+        return None
+    result = cv2.matchTemplate(gray, roi_img, method)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, max_loc
+
+
+def anchored_match(gray, roi_img, x, y, expand_factor=SEARCH_EXPAND_FACTOR,
+                   min_margin=MIN_SEARCH_MARGIN, method=MATCH_METHOD):
+    """Match a template only inside an expanded window around its annotated position (x, y).
+
+    Returns (max_val, max_loc) in frame coordinates, or None if the window does not hold the template.
+    """
+    h, w = roi_img.shape[:2]
+    margin_x = max(int(w * (expand_factor - 1) / 2), min_margin)
+    margin_y = max(int(h * (expand_factor - 1) / 2), min_margin)
+
+    x0 = max(0, int(x) - margin_x)
+    y0 = max(0, int(y) - margin_y)
+    x1 = min(gray.shape[1], int(x) + w + margin_x)
+    y1 = min(gray.shape[0], int(y) + h + margin_y)
+    if x1 - x0 < w or y1 - y0 < h:
+        return None
+
+    result = cv2.matchTemplate(gray[y0:y1, x0:x1], roi_img, method)
+    _, max_val, _, loc = cv2.minMaxLoc(result)
+    return max_val, (x0 + loc[0], y0 + loc[1])
+
+
+def usable_levels(frame_pyramid, roi_pyramid, min_size=MIN_PYRAMID_SIZE):
+    """Number of pyramid levels where the template is still large enough to match"""
+    levels = min(len(frame_pyramid), len(roi_pyramid))
+    while levels > 1 and min(roi_pyramid[levels - 1].shape[:2]) < min_size:
+        levels -= 1
+    return levels
+
+
+def _refine_window(frame_shape, roi_shape, center, margin):
+    """Clamp a search window of +/- margin around center so the template always fits"""
+    frame_h, frame_w = frame_shape[:2]
+    h, w = roi_shape[:2]
+    x0 = max(0, min(center[0] - margin, frame_w - w))
+    y0 = max(0, min(center[1] - margin, frame_h - h))
+    x1 = min(frame_w, max(x0 + w, center[0] + margin + w))
+    y1 = min(frame_h, max(y0 + h, center[1] + margin + h))
+    return x0, y0, x1, y1
+
+
+def coarse_candidates(frame, roi_img, count=PYRAMID_CANDIDATES, method=MATCH_METHOD):
+    """Locations of the `count` best matches over the whole frame, each one suppressing a template sized area"""
+    if roi_img.shape[0] > frame.shape[0] or roi_img.shape[1] > frame.shape[1]:
+        return []
+    result = cv2.matchTemplate(frame, roi_img, method)
+    h, w = roi_img.shape[:2]
+    candidates = []
+    for _ in range(count):
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if candidates and max_val <= -1:
+            break
+        candidates.append(max_loc)
+        x, y = max_loc
+        result[max(0, y - h // 2):y + h // 2 + 1, max(0, x - w // 2):x + w // 2 + 1] = -1
+    return candidates
+
+
+def pyramid_match(frame_pyramid, roi_pyramid, margin=PYRAMID_REFINE_MARGIN, method=MATCH_METHOD,
+                  candidates=PYRAMID_CANDIDATES):
+    """Coarse-to-fine match: full search on the coarsest level, local refinement on each finer level.
+
+    The best `candidates` coarse peaks are all refined, the one scoring best at full resolution wins.
+    Returns (max_val, max_loc) in full resolution coordinates, or None if the template does not fit.
+    """
+    top = usable_levels(frame_pyramid, roi_pyramid) - 1
+    if top == 0:
+        return full_match(frame_pyramid[0], roi_pyramid[0], method)
+
+    best = None
+    for max_loc in coarse_candidates(frame_pyramid[top], roi_pyramid[top], candidates, method):
+        for level in range(top - 1, -1, -1):
+            frame = frame_pyramid[level]
+            roi = roi_pyramid[level]
+            if roi.shape[0] > frame.shape[0] or roi.shape[1] > frame.shape[1]:
+                return None
+
+            center = (max_loc[0] * 2, max_loc[1] * 2)
+            x0, y0, x1, y1 = _refine_window(frame.shape, roi.shape, center, margin)
+            result = cv2.matchTemplate(frame[y0:y1, x0:x1], roi, method)
+            _, max_val, _, loc = cv2.minMaxLoc(result)
+            max_loc = (x0 + loc[0], y0 + loc[1])
+
+        if best is None or max_val > best[0]:
+            best = (max_val, max_loc)
+    return best
+
+
+def pyramid_deviation(gray, roi_items, levels=PYRAMID_LEVELS, margin=PYRAMID_REFINE_MARGIN):
+    """Compare pyramid matching against a full search for each (roi_file, roi_img).
+
+    Returns one dictionary per ROI with both scores, the score delta, the location
+    offset in pixels and the time each search took.
+    """
+    frame_pyramid = build_pyramid(gray, levels)
+    report = []
+    for roi_file, roi_img in roi_items:
+        start_time = time.perf_counter()
+        full = full_match(gray, roi_img)
+        full_ms = (time.perf_counter() - start_time) * 1000
+        if full is None:
+            continue
+
+        roi_pyramid = build_pyramid(roi_img, levels)
+        start_time = time.perf_counter()
+        pyramid = pyramid_match(frame_pyramid, roi_pyramid, margin)
+        pyramid_ms = (time.perf_counter() - start_time) * 1000
+        if pyramid is None:
+            continue
+
+        report.append({
+            "roi_file": roi_file,
+            "full_score": full[0],
+            "pyramid_score": pyramid[0],
+            "score_delta": full[0] - pyramid[0],
+            "loc_offset": max(abs(full[1][0] - pyramid[1][0]), abs(full[1][1] - pyramid[1][1])),
+            "full_ms": full_ms,
+            "pyramid_ms": pyramid_ms,
+        })
+    return report
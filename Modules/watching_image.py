@@ -1,18 +1,151 @@
 import os
 import time
+import ctypes
+import ctypes.util
+import select
+import struct
 import threading
 import logging
 from PIL import Image, ImageTk
 
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+SETTLE_INTERVAL = 0.1  # s between checks of a file that is still being written
+TRAILER_BYTES = 1024  # Tail read to find the JPEG end of image marker
+MAX_STALLED_CHECKS = 50  # Checks without growth before an incomplete file is given up, 5 s
+
+# inotify flags, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def is_image_file(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def is_complete_image(filepath):
+    """True when the file ends with its JPEG/PNG end marker, gphoto2 may still be writing it otherwise"""
+    try:
+        with open(filepath, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size < 64:
+                return False
+            f.seek(max(0, size - TRAILER_BYTES))
+            tail = f.read()
+    except OSError:
+        return False
+    if filepath.lower().endswith(".png"):
+        return b"IEND" in tail[-12:]
+    return b"\xff\xd9" in tail  # inside entropy coded data 0xFF is always stuffed, so this is the EOI marker
+
+
+class InotifyWatch:
+    """Names of files finished writing into one folder (close-write or renamed in), through libc inotify"""
+    def __init__(self, folder_path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder_path), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed on {folder_path}")
+
+    def wait(self, timeout):
+        """Return (names, overflowed) of the events arriving within timeout seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+
+        names = []
+        overflowed = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+            elif name:
+                names.append(os.fsdecode(name))
+        return names, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ScandirWatch:
+    """Fallback without inotify: lists the folder only when its mtime changes and never stats known files"""
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.dir_mtime = None
+        self.known = set()
+        self._scan()
+
+    def _scan(self):
+        self.dir_mtime = os.stat(self.folder_path).st_mtime_ns
+        with os.scandir(self.folder_path) as entries:
+            names = {entry.name for entry in entries}
+        new_names = names - self.known
+        self.known = names
+        return new_names
+
+    def wait(self, timeout):
+        """Return (names, overflowed) of the files created within timeout seconds"""
+        time.sleep(timeout)
+        if os.stat(self.folder_path).st_mtime_ns == self.dir_mtime:
+            return [], False
+        return sorted(self._scan()), False
+
+    def close(self):
+        pass
+
+
+def prepare_image(filepath, size):
+    """Decode an image fitted into size, keeping its aspect ratio.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale through the DCT scaling of libjpeg
+    (draft), so a 24MP DSLR image never gets decoded at full resolution.
+    """
+    img = Image.open(filepath)
+    img.draft("RGB", size)  # smallest DCT scale that is still at least size
+    scale = min(size[0] / img.width, size[1] / img.height)
+    target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if target != img.size:
+        img = img.resize(target, Image.BILINEAR, reducing_gap=2.0)
+    else:
+        img.load()
+    return img.convert("RGB") if img.mode not in ("RGB", "L") else img
+
+
 class ImageWatcher:
-    def __init__(self, folder_path, label_widget, update_interval=2):
+    """Show the newest image written into a folder, woken by inotify instead of polling.
+
+    Images are decoded on the watcher thread, run_in_ui hands the finished image to
+    the Tk thread (default: label_widget.after). The app gets DSLR captures from the
+    camera session directly, this is for folders filled by other tools.
+    """
+    def __init__(self, folder_path, label_widget, update_interval=2, run_in_ui=None):
         self.folder_path = folder_path
         self.label_widget = label_widget
-        self.update_interval = update_interval
+        self.run_in_ui = run_in_ui or (lambda func, *args: label_widget.after(0, func, *args))
+        # Tk is only touched from the Tk thread, so the screen size is read here
+        self.screen_w = label_widget.winfo_screenwidth()
+        self.screen_h = label_widget.winfo_screenheight()
+        self.update_interval = update_interval  # event wait, and the poll interval without inotify
         self.running = False
         self.latest_file = None
+        self.pending = {}  # name -> (size at the last check, checks without growth), files still being written
 
     def start(self):
         """Start watching the folder in a thread"""
@@ -24,44 +157,104 @@ class ImageWatcher:
         """Stop watching the folder"""
         self.running = False
 
-    def _watch_folder(self):
-        """Continuously watch the folder for new images"""
-        logger.info(f"Watching folder: {self.folder_path}")
-        while self.running:
-            try:
-                files = [f for f in os.listdir(self.folder_path) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
-                if files:
-                    # Sort by modified time (newest last)
-                    files = sorted(files, key=lambda f: os.path.getmtime(os.path.join(self.folder_path, f)))
-                    latest_file = os.path.join(self.folder_path, files[-1])
+    def _open_watch(self):
+        try:
+            return InotifyWatch(self.folder_path)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), polling folder changes every {self.update_interval}s")
+            return ScandirWatch(self.folder_path)
 
-                    if latest_file != self.latest_file:
-                        self.latest_file = latest_file
-                        self._update_label_with_image(latest_file)
+    def _newest_existing(self):
+        """Newest image already in the folder, looked up once when watching starts"""
+        newest, newest_mtime = None, None
+        with os.scandir(self.folder_path) as entries:
+            for entry in entries:
+                if is_image_file(entry.name) and entry.is_file():
+                    mtime = entry.stat().st_mtime_ns
+                    if newest_mtime is None or mtime > newest_mtime:
+                        newest, newest_mtime = entry.path, mtime
+        return newest
 
-                time.sleep(self.update_interval)
-            except Exception as e:
-                logger.error(f"Watcher error: {e}")
-                time.sleep(self.update_interval)
+    def _ready_files(self, names, from_events):
+        """Files of names plus pending ones that are completely written, in arrival order"""
+        for name in names:
+            if is_image_file(name):
+                self.pending.setdefault(name, (-1, 0))
 
-    def _update_label_with_image(self, filepath):
-        """Load and display the new image in the label full screen size"""
-        try:
-            # Get screen width & height from the label widget
-            screen_w = self.label_widget.winfo_screenwidth()
-            screen_h = self.label_widget.winfo_screenheight()
+        ready = []
+        for name, (last_size, stalled) in list(self.pending.items()):
+            filepath = os.path.join(self.folder_path, name)
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                del self.pending[name]  # removed or renamed away
+                continue
+            # a close-write event means gphoto2 is done, polled files must also stop growing
+            if (from_events or size == last_size) and is_complete_image(filepath):
+                del self.pending[name]
+                ready.append(filepath)
+            elif size != last_size:
+                self.pending[name] = (size, 0)
+            elif stalled + 1 >= MAX_STALLED_CHECKS:
+                del self.pending[name]  # e.g. an aborted download, a new close-write brings it back
+                logger.warning(f"Giving up on incomplete image {filepath}")
+            else:
+                self.pending[name] = (size, stalled + 1)
+        return ready
 
-            img = Image.open(filepath)
+    def _watch_folder(self):
+        """Wait for images finished writing into the folder and show the newest"""
+        logger.info(f"Watching folder: {self.folder_path}")
+        try:
+            os.makedirs(self.folder_path, exist_ok=True)
+            watch = self._open_watch()
+        except OSError as e:
+            logger.error(f"Watcher error: {e}")
+            return
+        from_events = isinstance(watch, InotifyWatch)
 
-            # Resize the image to fit screen exactly
-            img = img.resize((screen_w, screen_h))
+        try:
+            latest_file = self._newest_existing()
+            if latest_file:
+                self.latest_file = latest_file
+                self._update_label_with_image(latest_file)
 
-            tk_img = ImageTk.PhotoImage(img)
+            while self.running:
+                try:
+                    timeout = SETTLE_INTERVAL if self.pending else self.update_interval
+                    names, overflowed = watch.wait(timeout)
+                    if overflowed:
+                        latest_file = self._newest_existing()
+                        names = [os.path.basename(latest_file)] if latest_file else []
 
-            # Save reference to avoid garbage collection
-            self.label_widget.image = tk_img
-            self.label_widget.configure(image=tk_img, width=screen_w, height=screen_h)
+                    ready = self._ready_files(names, from_events)
+                    if ready and ready[-1] != self.latest_file:
+                        self.latest_file = ready[-1]
+                        self._update_label_with_image(self.latest_file)
+                except Exception as e:
+                    logger.error(f"Watcher error: {e}")
+                    time.sleep(self.update_interval)
+        finally:
+            watch.close()
 
-            logger.info(f"Displayed new image (resized to {screen_w}x{screen_h}): {filepath}")
+    def _update_label_with_image(self, filepath):
+        """Decode the new image fitted to the screen on the watcher thread, then hand it to Tk"""
+        try:
+            start_time = time.perf_counter()
+            img = prepare_image(filepath, (self.screen_w, self.screen_h))
+            decode_ms = (time.perf_counter() - start_time) * 1000
+            self.run_in_ui(self._show_image, img, filepath, decode_ms)
         except Exception as e:
             logger.error(f"Error displaying image: {e}")
+
+    def _show_image(self, img, filepath, decode_ms):
+        """Tk thread: only the PhotoImage upload and the label update happen here"""
+        if not self.running or not self.label_widget.winfo_exists():
+            return
+        tk_img = ImageTk.PhotoImage(img)
+
+        # Save reference to avoid garbage collection
+        self.label_widget.image = tk_img
+        self.label_widget.configure(image=tk_img, width=img.width, height=img.height)
+
+        logger.info(f"Displayed new image ({img.width}x{img.height}, decoded in {decode_ms:.0f} ms): {filepath}")
@@ -1,21 +1,13 @@
+import sys
 import cv2
 import time
 
-# GStreamer pipeline for Acasis VC-005 (MJPG, 1920x1080@30fps, partial GPU)
-DEVICE_PATH = '/dev/video0'
-pipeline = (
-    f"v4l2src device={DEVICE_PATH} ! "
-    "image/jpeg,width=1920,height=1080,framerate=30/1 ! "
-    "jpegdec ! video/x-raw ! "  # CPU-based JPEG decoding
-    "nvvidconv ! video/x-raw,format=BGRx ! "  # GPU-based format conversion
-    "videoconvert ! video/x-raw,format=BGR ! "
-    "appsink"
-)
+from Modules.Frame_source import open_source, DEVICE_PATH
 
-# Initialize OpenCV with GStreamer
-cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+# Acasis VC-005 (MJPG, 1920x1080@30fps, partial GPU), or a recorded session given as argument
+cap = open_source(sys.argv[1] if len(sys.argv) > 1 else DEVICE_PATH)
 if not cap.isOpened():
-    print(f"Error: Could not open device {DEVICE_PATH}. Test: gst-launch-1.0 v4l2src device=/dev/video0 ! image/jpeg,width=1920,height=1080,framerate=30/1 ! jpegdec ! nvvidconv ! video/x-raw,format=BGRx ! videoconvert ! autovideosink")
+    print(cap.error_help())
     exit()
 
 print("Press 'q' to QUIT.")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Stand-in for gphoto2 in tests: --auto-detect lists one camera, --shell saves a JPEG per capture.
+
+Environment:
+    FAKE_GPHOTO2_CAPTURE_DELAY  seconds one capture takes (default 0.1)
+    FAKE_GPHOTO2_HANG_ONCE      marker file path, the first capture hangs and creates it,
+                                later shells capture normally
+"""
+import os
+import sys
+import time
+
+args = sys.argv[1:]
+if "--auto-detect" in args:
+    print("Model                          Port")
+    print("----------------------------------------------------------")
+    print("USB PTP Class Camera           usb:001,031")
+    sys.exit(0)
+
+pattern = args[args.index("--filename") + 1]
+capture_delay = float(os.environ.get("FAKE_GPHOTO2_CAPTURE_DELAY", "0.1"))
+hang_marker = os.environ.get("FAKE_GPHOTO2_HANG_ONCE")
+number = 0
+while True:
+    print("gphoto2: {/} /> ", end="", flush=True)
+    line = sys.stdin.readline()
+    if not line or line.strip() in ("exit", "quit"):
+        break
+    if line.strip() != "capture-image-and-download":
+        print(f"*** Error: unknown command {line.strip()} ***")
+        continue
+
+    if hang_marker and not os.path.exists(hang_marker):
+        open(hang_marker, "w").close()
+        time.sleep(3600)
+    time.sleep(capture_delay)
+    number += 1
+    path = time.strftime(pattern.replace("%n", str(number)).replace("%C", "jpg"))
+    print("New file is in location /capt0000.jpg on the camera")
+    print(f"Saving file as {path}")
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8" + os.urandom(4096) + b"\xff\xd9")
+    print("Deleting file /capt0000.jpg on the camera")
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Modules.Camera_session import CameraSession, CameraError
+
+FAKE_GPHOTO2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_gphoto2.py")
+
+
+class CameraSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.folder, "captures")
+        self.marker = os.path.join(self.folder, "hung")
+        os.environ.pop("FAKE_GPHOTO2_HANG_ONCE", None)
+        os.environ["FAKE_GPHOTO2_CAPTURE_DELAY"] = "0.1"
+        self.session = CameraSession(self.output_dir, FAKE_GPHOTO2, start_timeout=5, capture_timeout=2)
+
+    def tearDown(self):
+        self.session.close()
+        os.environ.pop("FAKE_GPHOTO2_HANG_ONCE", None)
+        os.environ.pop("FAKE_GPHOTO2_CAPTURE_DELAY", None)
+        shutil.rmtree(self.folder)
+
+    def test_detect_caches_model_and_port(self):
+        self.assertTrue(self.session.detect())
+        self.assertEqual(self.session.model, "Canon EOS R10")
+        self.assertEqual(self.session.port, "usb:001,031")
+
+    def test_capture_downloads_file(self):
+        result = self.session.capture().result(timeout=10)
+        self.assertTrue(os.path.isfile(result["path"]))
+        self.assertEqual(os.path.dirname(result["path"]), self.output_dir)
+        self.assertGreater(result["capture_ms"], 0)
+        self.assertGreaterEqual(result["queued_ms"], result["capture_ms"])
+
+        # the second capture reuses the open shell
+        second = self.session.capture().result(timeout=10)
+        self.assertNotEqual(second["path"], result["path"])
+        self.assertEqual(self.session.captures, 2)
+        self.assertEqual(self.session.restarts, 0)
+
+    def test_single_capture_in_flight(self):
+        os.environ["FAKE_GPHOTO2_CAPTURE_DELAY"] = "0.5"
+        first = self.session.capture()
+        second = self.session.capture()
+        self.assertIs(first, second)
+        first.result(timeout=10)
+        self.assertEqual(len(os.listdir(self.output_dir)), 1)
+
+    def test_hung_capture_restarts_session(self):
+        os.environ["FAKE_GPHOTO2_HANG_ONCE"] = self.marker
+        result = self.session.capture().result(timeout=15)
+        self.assertTrue(os.path.exists(self.marker))
+        self.assertTrue(os.path.isfile(result["path"]))
+        self.assertEqual(self.session.restarts, 1)
+
+    def test_failing_captures_raise(self):
+        session = CameraSession(self.output_dir, "/nonexistent/gphoto2", start_timeout=1, capture_timeout=1)
+        session.model, session.port = "Canon EOS R10", "usb:001,031"
+        with self.assertRaises(CameraError):
+            session.capture().result(timeout=10)
+        session.close()
+
+    def test_close_aborts_running_capture(self):
+        os.environ["FAKE_GPHOTO2_HANG_ONCE"] = self.marker
+        self.session.capture_timeout = 30
+        future = self.session.capture()
+        while not os.path.exists(self.marker):
+            time.sleep(0.01)
+        start_time = time.perf_counter()
+        self.session.close(timeout=0.5)
+        self.assertLess(time.perf_counter() - start_time, 3)
+        with self.assertRaises(CameraError):
+            future.result(timeout=5)
+        self.assertIsNone(self.session.proc)
+
+
+if __name__ == "__main__":
+    unittest.main()
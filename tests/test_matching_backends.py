@@ -0,0 +1,75 @@
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Benchmark import synthetic_board
+from Modules.Matching_backends import create_backend, cuda_available
+from Modules.Template_matching import full_match
+
+BOARDS = 3
+ROIS_PER_BOARD = 12
+FRAME_SIZE = (960, 540)
+SCORE_TOLERANCE = 1e-3
+THRESHOLD = 0.7
+
+
+def board_templates(gray, components, seed):
+    """Templates of the board's components, a flat one and one cut from another board"""
+    rois = {f"roi_{i}": gray[c["y"]:c["y"] + c["height"], c["x"]:c["x"] + c["width"]].copy()
+            for i, c in enumerate(components)}
+    rois["flat"] = np.full((24, 24), 128, np.uint8)
+    other, other_components = synthetic_board(*FRAME_SIZE, 1, seed=1000 + seed)
+    c = other_components[0]
+    rois["missing"] = cv2.cvtColor(other, cv2.COLOR_BGR2GRAY)[c["y"]:c["y"] + c["height"], c["x"]:c["x"] + c["width"]]
+    return rois
+
+
+class BackendParityTest(unittest.TestCase):
+    """Every backend must return the scores, locations and match_all results of cv2.matchTemplate"""
+
+    def check_backend(self, name):
+        # one backend for all boards, like the engine keeps it across recipe changes
+        backend = create_backend(name)
+        for board in range(BOARDS):
+            frame, components = synthetic_board(*FRAME_SIZE, ROIS_PER_BOARD, seed=board)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            rois = board_templates(gray, components, board)
+
+            backend.clear()
+            for key, roi_img in rois.items():
+                backend.load(key, roi_img)
+            backend.prepare(gray.shape)
+            backend.set_frame(gray)
+
+            expected = {key: full_match(gray, roi_img) for key, roi_img in rois.items()}
+            for key in rois:
+                with self.subTest(board=board, roi=key):
+                    got = backend.match(key)
+                    want = expected[key]
+                    self.assertAlmostEqual(got[0], want[0], delta=SCORE_TOLERANCE)
+                    if want[0] > 0.99:
+                        self.assertEqual(tuple(got[1]), tuple(want[1]))
+
+            with self.subTest(board=board, roi="match_all"):
+                got_keys = sorted(m[2] for m in backend.match_all(THRESHOLD))
+                want_keys = sorted(key for key, (score, _) in expected.items() if score >= THRESHOLD)
+                self.assertEqual(got_keys, want_keys)
+
+    def test_opencv(self):
+        self.check_backend("opencv")
+
+    def test_fft(self):
+        self.check_backend("fft")
+
+    @unittest.skipUnless(cuda_available(), "no CUDA device")
+    def test_cuda(self):
+        self.check_backend("cuda")
+
+
+if __name__ == "__main__":
+    unittest.main()
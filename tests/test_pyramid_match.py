@@ -0,0 +1,37 @@
+import os
+import sys
+import unittest
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Benchmark import synthetic_board
+from Modules.Template_matching import build_pyramid, full_match, pyramid_match, PYRAMID_LEVELS
+
+
+class PyramidMatchTest(unittest.TestCase):
+    def check_board(self, size_range, seed):
+        frame, components = synthetic_board(1280, 720, 16, size_range, seed)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame_pyramid = build_pyramid(gray, PYRAMID_LEVELS)
+        for component in components:
+            x, y, w, h = component["x"], component["y"], component["width"], component["height"]
+            roi_img = gray[y:y + h, x:x + w]
+            with self.subTest(kind=component["kind"], x=x, y=y, width=w, height=h):
+                full = full_match(gray, roi_img)
+                pyramid = pyramid_match(frame_pyramid, build_pyramid(roi_img, PYRAMID_LEVELS))
+                self.assertEqual(pyramid[1], full[1])
+                self.assertAlmostEqual(pyramid[0], full[0], places=4)
+
+    def test_small_components_match_full_search(self):
+        for seed in range(3):
+            self.check_board((30, 80), seed)
+
+    def test_large_components_match_full_search(self):
+        for seed in range(3):
+            self.check_board((60, 120), seed)
+
+
+if __name__ == "__main__":
+    unittest.main()